@@ -3,9 +3,11 @@ import FreeCADGui
 import ObjectsFem
 
 import contextlib
+import functools
 import queue
 import base64
 import io
+import json
 import os
 import tempfile
 import threading
@@ -15,6 +17,11 @@ from xmlrpc.server import SimpleXMLRPCServer
 
 from PySide import QtCore
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Optional: stdlib json is used when orjson is not installed
+
 from .parts_library import get_parts_list, insert_part_from_library
 from .serialize import serialize_object
 
@@ -26,6 +33,32 @@ rpc_request_queue = queue.Queue()
 rpc_response_queue = queue.Queue()
 
 
+@functools.lru_cache(maxsize=64)
+def _compile_script(code: str):
+    """Compile a script once; templated tools resend identical source with new params."""
+    return compile(code, "<freecad-mcp>", "exec")
+
+
+def _loads_json(data: str) -> Any:
+    """Parse script PARAMS, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dumps_json(obj: Any) -> str:
+    """Serialize a script result, using orjson when available.
+
+    Falls back to stdlib json for values orjson rejects (e.g. numpy scalars).
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(",", ":"))
+
+
 def process_gui_tasks():
     while not rpc_request_queue.empty():
         task = rpc_request_queue.get()
@@ -169,29 +202,20 @@ class FreeCADRPC:
         else:
             return {"success": False, "error": res}
 
-    def execute_code(self, code: str) -> dict[str, Any]:
-        output_buffer = io.StringIO()
-        def task():
-            try:
-                with contextlib.redirect_stdout(output_buffer):
-                    exec(code, globals())
-                FreeCAD.Console.PrintMessage("Python code executed successfully.\n")
-                return True
-            except Exception as e:
-                FreeCAD.Console.PrintError(
-                    f"Error executing Python code: {e}\n"
-                )
-                return f"Error executing Python code: {e}\n"
+    def execute_code(self, code: str, params_json: str | None = None) -> dict[str, Any]:
+        rpc_request_queue.put(lambda: self._execute_code_gui(code, params_json))
+        return rpc_response_queue.get()
 
-        rpc_request_queue.put(task)
-        res = rpc_response_queue.get()
-        if res is True:
-            return {
-                "success": True,
-                "message": "Python code execution scheduled. \nOutput: " + output_buffer.getvalue()
-            }
-        else:
-            return {"success": False, "error": res}
+    def execute_batch(self, scripts: list[list[str | None]]) -> list[dict[str, Any]]:
+        """Run several [code, params_json] scripts in order in one GUI task.
+
+        Each script still gets its own result, but the batch pays for a single
+        request and a single GUI queue hop instead of one per script.
+        """
+        rpc_request_queue.put(
+            lambda: [self._execute_code_gui(code, params_json) for code, params_json in scripts]
+        )
+        return rpc_response_queue.get()
 
     def get_objects(self, doc_name):
         doc = FreeCAD.getDocument(doc_name)
@@ -272,6 +296,34 @@ class FreeCADRPC:
             FreeCAD.Console.PrintWarning(f"Failed to capture screenshot: {res}\n")
             return None
 
+    def _execute_code_gui(self, code: str, params_json: str | None = None) -> dict[str, Any]:
+        output_buffer = io.StringIO()
+        try:
+            compiled = _compile_script(code)
+            if params_json is None:
+                namespace = globals()
+            else:
+                # Parameterized scripts get their own namespace with PARAMS; a
+                # script may hand back a structured result by assigning _result
+                namespace = {**globals(), "PARAMS": _loads_json(params_json), "_RESULT_CHANNEL": True}
+            with contextlib.redirect_stdout(output_buffer):
+                exec(compiled, namespace)
+            FreeCAD.Console.PrintMessage("Python code executed successfully.\n")
+            response = {
+                "success": True,
+                "message": "Python code execution scheduled. \nOutput: " + output_buffer.getvalue()
+            }
+            if params_json is not None and "_result" in namespace:
+                # Sent as JSON text so the result is not subject to XML-RPC
+                # marshalling limits (non-string keys, large ints)
+                response["result_json"] = _dumps_json(namespace["_result"])
+            return response
+        except Exception as e:
+            FreeCAD.Console.PrintError(
+                f"Error executing Python code: {e}\n"
+            )
+            return {"success": False, "error": f"Error executing Python code: {e}\n"}
+
     def _create_document_gui(self, name):
         doc = FreeCAD.newDocument(name)
         doc.recompute()
@@ -10,119 +10,1411 @@ These tools implement the bridge between FreeCAD (engineering truth) and
 site-fit (constraint solver) / Blender (visualization) layers.
 """
 
+import asyncio
+import functools
 import json
 import hashlib
 import os
 import tempfile
-from datetime import datetime
+import xmlrpc.client
+from datetime import datetime, timezone
 from typing import Any
 
 import structlog
 from mcp.server.fastmcp import Context
 from mcp.types import TextContent, ImageContent
 
+from .geom_ops import center_to_corner, scale_point_lists, scale_points, validate_points
 from .path_utils import wsl_to_windows_path
 from .response_filters import DetailLevel, filter_contract_response
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Optional: stdlib json is used when orjson is not installed
+
 logger = structlog.get_logger("FreeCADMCPserver.contract")
 
-# Unit conversion: FreeCAD uses mm internally, contract uses meters
-MM_TO_M = 0.001
-M_TO_MM = 1000.0
+# Unit conversion: FreeCAD uses mm internally, contract uses meters
+MM_TO_M = 0.001
+M_TO_MM = 1000.0
+# Decimals kept on mm coordinates sent to FreeCAD (1 micron; far below
+# modelling tolerance, and keeps PARAMS free of 17-digit float noise)
+MM_DECIMALS = 3
+
+# Equipment types (lowercase) that get dome covers in create_equipment_envelope
+DOME_COVER_TYPES: frozenset[str] = frozenset(
+    {"digester", "anaerobic_digester", "anmbr", "gas_holder"}
+)
+# Equipment types (lowercase) that get dome covers in import_sitefit_contract
+SITEFIT_DOME_COVER_TYPES: frozenset[str] = frozenset(
+    {"digester", "anaerobic_digester", "reactor", "cstr",
+     "uasb", "egsb", "ic_reactor", "membrane_bioreactor"}
+)
+# Dome height ratio: 6m cover / 40m diameter
+DOME_RATIO = 0.15
+# Plan-sheet templates tried in order by finalize_selected_layout
+TECHDRAW_TEMPLATE_CANDIDATES = (
+    "/usr/share/freecad/Mod/TechDraw/Templates/A1_Landscape_ISO7200_Pep.svg",
+    "/usr/share/freecad-daily/Mod/TechDraw/Templates/A1_Landscape_ISO7200_Pep.svg",
+)
+# Equipment types (lowercase) that get flat roofs in create_equipment_envelope
+BUILDING_TYPES: frozenset[str] = frozenset(
+    {"building", "control_building", "biogas_building", "pump_station",
+     "blower_building", "mcc_building", "dewatering_building", "uv_building",
+     "chemical_building", "screen_building"}
+)
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time as an ISO 8601 string with a 'Z' suffix (second precision)."""
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+def get_rect_dims_at_rotation(w: float, h: float, rotation_deg: int) -> tuple[float, float]:
+    """Get rectangle dimensions adjusted for rotation.
+
+    Site-fit solver uses rotation to swap the axis-aligned bounding box.
+    For rotation 90 or 270, width and height are swapped.
+
+    Args:
+        w: Original width (X-dimension at rotation=0)
+        h: Original height (Y-dimension at rotation=0)
+        rotation_deg: Rotation in degrees (0, 90, 180, 270)
+
+    Returns:
+        Tuple of (effective_width, effective_height) for FreeCAD Part::Box
+    """
+    if rotation_deg in (90, 270):
+        return h, w
+    return w, h
+
+
+def _index_placements(placements: list[dict], keys: tuple[str, ...] = ("structure_id", "id")) -> dict:
+    """Index placements by structure id for O(1) lookup.
+
+    The first placement matching a given id wins, as with a linear scan.
+
+    Args:
+        placements: Placement dicts from a contract or solution
+        keys: Placement fields that may carry the structure id
+
+    Returns:
+        Dict mapping structure id to its placement
+    """
+    index = {}
+    for p in placements:
+        for key in keys:
+            struct_id = p.get(key)
+            if struct_id is not None:
+                index.setdefault(struct_id, p)
+    return index
+
+
+def _segment_centerline(seg: dict) -> list:
+    """Return a road segment's centerline points (in contract units).
+
+    Uses the explicit centerline array when present, otherwise
+    start + waypoints + end.
+    """
+    centerline = seg.get("centerline")
+    if centerline:
+        return centerline
+    start = seg.get("start") or [0, 0]
+    end = seg.get("end") or [0, 0]
+    waypoints = seg.get("waypoints") or []
+    return [start] + waypoints + [end]
+
+
+@functools.lru_cache(maxsize=1)
+def _resolve_techdraw_template() -> str | None:
+    """Return the first TechDraw template candidate that exists locally.
+
+    Resolved once per process. Returns None when none is visible from here
+    (e.g. FreeCAD runs on the Windows side of WSL); the FreeCAD-side script
+    then searches the candidates itself.
+    """
+    return next((p for p in TECHDRAW_TEMPLATE_CANDIDATES if os.path.exists(p)), None)
+
+
+def _jloads(data: str | bytes) -> Any:
+    """Parse JSON, using orjson when available.
+
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+    keep catching the stdlib exception type.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _jdumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when available.
+
+    Args:
+        obj: JSON-serializable object
+        indent: Pretty-print with 2-space indentation
+
+    Returns:
+        Encoded JSON document
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _atomic_write_json(path: str, obj: Any, indent: bool = False) -> int:
+    """Serialize obj to JSON and write it to path atomically.
+
+    The bytes go to a uniquely named temp file in the target directory
+    that is renamed over path once complete, so readers never see a
+    half-written file and concurrent writers to the same path don't share
+    a temp file. Meant to run on a worker thread, serialization included.
+
+    Args:
+        path: Destination file
+        obj: JSON-serializable object
+        indent: Pretty-print with 2-space indentation
+
+    Returns:
+        Number of bytes written
+    """
+    data = _jdumps(obj, indent=indent)
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates the file 0600; keep the mode of the file being
+        # replaced, or use the usual 0644 for a new one
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(data)
+
+
+# Phase 1D: Draft API compatibility wrapper snippet
+# Both Draft.makeWire and Draft.make_wire work (they're aliases per DeepWiki),
+# but this wrapper provides insurance against future FreeCAD API changes.
+DRAFT_MAKE_WIRE_COMPAT = """
+def _make_wire_compat(vectors, closed=False, face=False):
+    '''Version-compatible wire creation. Both names work in FreeCAD 0.19+.'''
+    import Draft
+    make_fn = getattr(Draft, 'make_wire', None) or getattr(Draft, 'makeWire')
+    return make_fn(vectors, closed=closed, face=face)
+"""
+
+# Polyline snippet for bulk imports. By default a wire is a plain
+# Part::Feature holding a Part.makePolygon shape: no Draft proxy, property
+# bag or recompute hook per segment. parametric=True keeps the editable
+# Draft wire for users who need it.
+POLYLINE_BUILDER = DRAFT_MAKE_WIRE_COMPAT + """
+import FreeCAD
+import Part
+
+
+def _make_polyline(doc, name, points_mm, closed=False, parametric=False):
+    vectors = [FreeCAD.Vector(*p) for p in points_mm]
+    if parametric:
+        return _make_wire_compat(vectors, closed=closed, face=False)
+    if closed:
+        vectors.append(vectors[0])
+    obj = doc.addObject("Part::Feature", name)
+    obj.Shape = Part.makePolygon(vectors)
+    return obj
+"""
+
+
+# Equipment lookup snippet shared by the placement scripts. doc.getObject and
+# doc.getObjectsByLabel scan every object, so the document is indexed once per
+# script and each placement resolves with dict lookups.
+FIND_EQUIPMENT_BY_ID = """
+def _make_equipment_finder(doc):
+    by_equipment_id = {}
+    by_name = {}
+    by_label = {}
+    for o in doc.Objects:
+        equip_id = getattr(o, "EquipmentId", None)
+        if equip_id:
+            by_equipment_id.setdefault(equip_id, o)
+        by_name[o.Name] = o
+        by_label.setdefault(o.Label, []).append(o)
+
+    def find_equipment_by_id(equip_id):
+        '''Find equipment by EquipmentId property first (survives name collisions).'''
+        obj = by_equipment_id.get(equip_id)
+        if obj:
+            return obj
+        # Fallback to normalized Name (FreeCAD converts hyphens to underscores)
+        obj = by_name.get(equip_id.replace("-", "_"))
+        if obj:
+            return obj
+        # Fallback to Label search
+        matches = by_label.get(equip_id, [])
+        if len(matches) == 1:
+            return matches[0]
+        return None
+
+    return find_equipment_by_id
+"""
+
+# Equipment envelope snippet shared by the envelope, site-fit and layout
+# builders. Specs carry mm dimensions and a "kind" (dome, cylinder, building
+# or box). Tanks and buildings are plain shapes stored in a single
+# Part::Feature centered on the origin, so a digester adds one document
+# object instead of a Cylinder, an Ellipsoid and a Compound. Boxes stay
+# Part::Box with its corner origin, which the placement code offsets by
+# half the (pre-swapped) Width/Length. Imports sit at snippet level so the
+# per-equipment calls don't re-run them.
+ENVELOPE_BUILDER = """
+import FreeCAD
+import Part
+
+
+def _make_dome_tank_shape(radius_mm, height_mm, dome_height_mm):
+    tank = Part.makeCylinder(radius_mm, height_mm)
+    # Upper hemisphere flattened to the dome height (Part has no makeEllipsoid)
+    dome = Part.makeSphere(radius_mm, FreeCAD.Vector(0, 0, 0), FreeCAD.Vector(0, 0, 1), 0, 90, 360)
+    squash = FreeCAD.Matrix()
+    squash.scale(1.0, 1.0, dome_height_mm / radius_mm)
+    dome = dome.transformGeometry(squash)
+    # Position dome on top of tank
+    dome.translate(FreeCAD.Vector(0, 0, height_mm))
+    return Part.makeCompound([tank, dome])
+
+
+def _make_building_shape(width_mm, length_mm, wall_height_mm, roof_thickness_mm, overhang_mm):
+    # Walls (main building body), centered on origin; X matches contract w,
+    # Y matches contract h
+    walls = Part.makeBox(width_mm, length_mm, wall_height_mm,
+                         FreeCAD.Vector(-width_mm / 2, -length_mm / 2, 0))
+    # Flat roof slab with overhang, on top of walls
+    roof = Part.makeBox(width_mm + 2 * overhang_mm, length_mm + 2 * overhang_mm, roof_thickness_mm,
+                        FreeCAD.Vector(-width_mm / 2 - overhang_mm, -length_mm / 2 - overhang_mm,
+                                       wall_height_mm))
+    return Part.makeCompound([walls, roof])
+
+
+def _create_envelope(doc, name, spec):
+    kind = spec["kind"]
+    if kind == "box":
+        obj = doc.addObject("Part::Box", name)
+        obj.Width = spec["width_mm"]    # X dimension (matches contract w)
+        obj.Length = spec["length_mm"]  # Y dimension (matches contract h)
+        obj.Height = spec["height_mm"]
+        return obj
+    if kind == "dome":
+        # Height is the shell height, dome added on top
+        shape = _make_dome_tank_shape(spec["radius_mm"], spec["height_mm"], spec["dome_height_mm"])
+    elif kind == "cylinder":
+        shape = Part.makeCylinder(spec["radius_mm"], spec["height_mm"])
+    elif kind == "building":
+        shape = _make_building_shape(spec["width_mm"], spec["length_mm"], spec["wall_height_mm"],
+                                     spec["roof_thickness_mm"], spec["overhang_mm"])
+    else:
+        raise ValueError(f"Unknown envelope kind: {kind}")
+    obj = doc.addObject("Part::Feature", name)
+    obj.Shape = shape
+    return obj
+
+
+def _tag_equipment(obj, equipment_id, equipment_type):
+    # Add EquipmentId for stable lookup (survives name collisions)
+    try:
+        obj.addProperty("App::PropertyString", "EquipmentId", "ProcessEng", "Stable equipment ID")
+    except Exception:
+        pass  # Property may already exist
+    obj.EquipmentId = equipment_id
+
+    try:
+        obj.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
+    except Exception:
+        pass  # Property may already exist
+    obj.EquipmentType = equipment_type
+"""
+
+# Script results come back through the addon's result channel: a
+# parameterized script assigns _result and the addon returns it, serialized,
+# as "result_json" next to the captured output. Every script that produces a
+# structured result is a PARAMS script, and the addon version that accepts
+# params_json also provides the channel, so nothing is parsed out of stdout.
+SET_SCRIPT_RESULT = """
+def _set_result(obj):
+    '''Hand obj back to the MCP server through the addon's result channel.'''
+    global _result
+    _result = obj
+"""
+
+
+def _script_result(res: dict) -> dict | None:
+    """Return the structured result of a script run through execute_code.
+
+    Returns:
+        The value the script passed to ``_set_result``, or None if it set none
+
+    Raises:
+        json.JSONDecodeError: If the result is not valid JSON
+    """
+    result_json = res.get("result_json")
+    if result_json is None:
+        return None
+    return _jloads(result_json)
+
+
+# FreeCAD-side scripts are module constants rather than per-call f-strings:
+# the source is identical on every call (so the RPC server can reuse its
+# compiled code object) and per-call values arrive in the PARAMS dict.
+_EXTRACT_SRC = SET_SCRIPT_RESULT + """
+import FreeCAD
+import json
+import re
+import numpy as np
+
+doc_name = PARAMS["doc_name"]
+doc = FreeCAD.getDocument(doc_name)
+if not doc:
+    raise ValueError(f"Document '{doc_name}' not found")
+
+result = {
+    "project": {
+        "name": PARAMS["project_name"],
+        "crs": "local",
+        "origin": {"easting": 0, "northing": 0, "elevation": 0},
+        "rotation_deg": 0,
+        "unit": "m",
+        "version": "1.0.0"
+    },
+    "site": {
+        "boundary": [],
+        "keepouts": [],
+        "entrances": []
+    },
+    "equipment": [],
+    "placements": [],
+    "connections": [],
+    "viz_overrides": [],
+    "metadata": {
+        "created_at": PARAMS["created_at"],
+        "created_by": "freecad-mcp/export_contract_json",
+        "source_file": doc.FileName if doc.FileName else doc.Name
+    }
+}
+
+# Unit conversion factor (mm to m)
+MM_TO_M = 0.001
+
+# Extract site boundary if specified
+boundary_name = PARAMS["boundary_object"] or None
+if boundary_name:
+    boundary_obj = doc.getObject(boundary_name)
+    # Points are stacked into one (M, 2) array and scaled in a single multiply
+    if boundary_obj and hasattr(boundary_obj, "Points"):
+        # Draft Wire/Polyline has Points property
+        xy = [(p.x, p.y) for p in boundary_obj.Points]
+    elif boundary_obj and hasattr(boundary_obj, "Shape"):
+        # Extract from shape vertices
+        xy = [(v.X, v.Y) for v in boundary_obj.Shape.Vertexes]
+    else:
+        xy = []
+    if xy:
+        result["site"]["boundary"] = (np.array(xy, dtype=np.float64) * MM_TO_M).tolist()
+
+# Equipment type mapping based on name patterns. Branches are tried in
+# order from the start of the name, so the first matching keyword wins the
+# same way the original if/elif chain did; prefixes only match at the start.
+TYPE_RE = re.compile(
+    r"(?:"
+    r"(?P<storage_tank>.*?tank|tk)"
+    r"|(?P<reactor>.*?reactor|r-)"
+    r"|(?P<pump>.*?pump|p-)"
+    r"|(?P<clarifier>.*?clarifier)"
+    r"|(?P<thickener>.*?thickener)"
+    r"|(?P<filter>.*?filter)"
+    r"|(?P<blower>.*?blower|bl-)"
+    r"|(?P<compressor>.*?compressor)"
+    r"|(?P<heat_exchanger>.*?exchanger|e-)"
+    r"|(?P<column>.*?column|c-)"
+    r"|(?P<vessel>.*?vessel|v-)"
+    r"|(?P<basin>.*?basin)"
+    r"|(?P<building>.*?building)"
+    r"|(?P<substation>.*?substation)"
+    r"|(?P<mcc>.*?mcc)"
+    r"|(?P<pipe_rack>.*?rack)"
+    r")",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Tags like TK-101/TK-102 differ only in digits, which never take part in a
+# match, so results are memoized on the name with digit runs collapsed
+DIGITS_RE = re.compile(r"[0-9]+")
+type_cache = {}
+
+def infer_equipment_type(obj_name, obj_type):
+    key = DIGITS_RE.sub("#", obj_name)
+    equip_type = type_cache.get(key)
+    if equip_type is None:
+        m = TYPE_RE.match(key)
+        equip_type = type_cache[key] = m.lastgroup if m else "other"
+    return equip_type
+
+# Extract equipment from all objects in document.
+# First pass filters objects and collects raw bounding boxes and elevations;
+# scaling, rounding and shape classification then run once over the arrays.
+equipment_prefix = PARAMS["equipment_prefix"]
+
+# Draft objects that aren't equipment (wires, dimensions, etc.)
+SKIP_TYPES = frozenset(["Draft::Wire", "Draft::Dimension", "Draft::Text", "Draft::Label"])
+
+# Cheap name filters run as comprehensions ahead of the main loop, so
+# with a prefix the loop below only visits matching objects
+candidates = doc.Objects
+if equipment_prefix:
+    candidates = [obj for obj in candidates if obj.Name.startswith(equipment_prefix)]
+if boundary_name:
+    candidates = [obj for obj in candidates if obj.Name != boundary_name]
+
+valid = []
+bbox_rows = []
+base_z = []
+for obj in candidates:
+    # Type filter before Shape so filtered-out objects never touch it
+    if obj.TypeId in SKIP_TYPES:
+        continue
+
+    # Skip non-shape objects; Shape is read once (each read wraps a new
+    # TopoShape) instead of once for the hasattr probe and again for use
+    try:
+        shape = obj.Shape
+    except AttributeError:
+        continue
+    if shape.isNull():
+        continue
+
+    try:
+        # XLength/YLength/ZLength are computed on the C++ side: three
+        # lookups instead of six min/max reads per object
+        bbox = shape.BoundBox
+        bbox_rows.append((bbox.XLength, bbox.YLength, bbox.ZLength))
+    except:
+        continue
+
+    # Only the base elevation goes into the equipment record; x/y and
+    # rotation belong to the placements, which the solver produces
+    base_z.append(obj.Placement.Base.z)
+    valid.append(obj)
+
+# Envelope extents (width, length, height) and base elevations in m
+dims = np.array(bbox_rows, dtype=np.float64).reshape(-1, 3) * MM_TO_M
+
+# Roughly circular when width ~= length; classified with one mask over all
+# objects, then converted to Python lists once to avoid numpy scalar boxing
+w = dims[:, 0]
+l = dims[:, 1]
+circular_mask = np.abs(w - l) < 0.1 * np.maximum(w, l)
+dims_r = np.round(dims, 3)
+diameters_r = np.round((w + l) / 2, 3)
+envelopes = [
+    {"shape": "circle", "diameter": d} if c else {"shape": "rectangle", "width": wi, "length": li}
+    for c, d, wi, li in zip(
+        circular_mask.tolist(), diameters_r.tolist(), dims_r[:, 0].tolist(), dims_r[:, 1].tolist()
+    )
+]
+heights_r = dims_r[:, 2].tolist()
+base_elev_r = np.round(np.array(base_z, dtype=np.float64) * MM_TO_M, 3).tolist()
+
+# Per-object fields are gathered column-wise and the records built in one
+# pass. The clearances dict is shared between records: the result is only
+# serialized, never mutated per item.
+names = [obj.Name for obj in valid]
+equip_types = [infer_equipment_type(obj.Name, obj.TypeId) for obj in valid]
+truth_prefix = f"FreeCAD::{doc.Name}::"
+CLEARANCES = {"maintenance": 2.0, "operation": 1.5}
+
+result["equipment"] = equipment = [
+    {
+        "id": name,
+        "type": equip_type,
+        "envelope": envelope,
+        "height": height,
+        "base_elevation": base_elev,
+        "truth_ref": truth_prefix + name,
+        "clearances": CLEARANCES,
+    }
+    for name, equip_type, envelope, height, base_elev in zip(
+        names, equip_types, envelopes, heights_r, base_elev_r
+    )
+]
+
+# Extract parameters from Spreadsheet if linked
+# ExpressionEngine is a list of (property, expression) pairs
+for obj, equipment_item in zip(valid, equipment):
+    parameters = dict(obj.ExpressionEngine) if hasattr(obj, "ExpressionEngine") else {}
+    if parameters:
+        equipment_item["parameters"] = parameters
+
+# Compute content hash for reproducibility tracking. orjson and the compact
+# json fallback produce the same sorted UTF-8 bytes, so the digest does not
+# depend on which serializer FreeCAD has available.
+try:
+    import orjson
+    content_bytes = orjson.dumps(result["equipment"], option=orjson.OPT_SORT_KEYS)
+except ImportError:
+    content_bytes = json.dumps(
+        result["equipment"], sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+try:
+    import blake3
+    hash_algo, digest = "blake3", blake3.blake3(content_bytes).hexdigest()
+except ImportError:
+    import hashlib
+    hash_algo, digest = "sha256", hashlib.sha256(content_bytes, usedforsecurity=False).hexdigest()
+result["metadata"]["hash"] = hash_algo + ":" + digest[:16]
+
+_set_result(result)
+"""
+
+_APPLY_SRC = SET_SCRIPT_RESULT + FIND_EQUIPMENT_BY_ID + """
+import FreeCAD
+
+doc_name = PARAMS["doc_name"]
+doc = FreeCAD.getDocument(doc_name)
+if not doc:
+    raise ValueError(f"Document '{doc_name}' not found")
+
+# Unit conversion (m to mm)
+M_TO_MM = 1000.0
+
+find_equipment_by_id = _make_equipment_finder(doc)
+
+placements = PARAMS["placements"]
+updated = []
+errors = []
+touched = []
+
+# Constructors and the Z axis are bound once; the loop below runs at
+# script level, where each FreeCAD.X is a global load plus attribute lookup
+Vector = FreeCAD.Vector
+Rotation = FreeCAD.Rotation
+Placement = FreeCAD.Placement
+Z_AXIS = Vector(0, 0, 1)
+
+# One undo step for the whole batch; only moved objects are recomputed below.
+# Recomputes stay frozen while placements are written so expression-linked
+# objects are not re-evaluated per assignment; the transaction is committed
+# even if a placement raises, so the document is never left mid-transaction.
+doc.openTransaction("apply_placements")
+was_frozen = getattr(doc, "RecomputesFrozen", None)
+if was_frozen is not None:
+    doc.RecomputesFrozen = True
+try:
+    for p in placements:
+        # Support both 'id' (contract format) and 'structure_id' (site-fit format)
+        obj_id = p.get("id") or p.get("structure_id")
+        if not obj_id:
+            errors.append("Placement missing both 'id' and 'structure_id'")
+            continue
+
+        x = p.get("x", 0) * M_TO_MM  # Convert m to mm
+        y = p.get("y", 0) * M_TO_MM
+        rotation_deg = p.get("rotation_deg", 0)
+
+        obj = find_equipment_by_id(obj_id)
+        if not obj:
+            errors.append(f"Object '{obj_id}' not found")
+            continue
+
+        # Get current Z position to preserve elevation
+        current_z = obj.Placement.Base.z
+
+        # For Part::Box (rectangular equipment), dimensions are pre-swapped during creation
+        # based on rotation_deg, so we use simple center-to-corner offset (no FreeCAD rotation)
+        # Site-fit provides CENTER coordinates, but FreeCAD Part::Box uses CORNER as origin
+        if obj.TypeId == "Part::Box":
+            # FreeCAD Part::Box dimensions: Width=X, Length=Y, Height=Z
+            # These are already swapped for 90/270 rotation during equipment creation
+            half_x = obj.Width.Value / 2.0
+            half_y = obj.Length.Value / 2.0
+
+            # Simple center-to-corner offset (no rotation - dimensions pre-swapped)
+            new_pos = Vector(x - half_x, y - half_y, current_z)
+
+            # No rotation needed - dimensions are pre-swapped based on rotation_deg
+            obj.Placement = Placement(new_pos, Rotation())
+        else:
+            # Cylinders and other shapes are already centered
+            # Apply rotation for non-rectangular shapes (though circles don't care about rotation)
+            rotation = Rotation(Z_AXIS, rotation_deg)
+            new_pos = Vector(x, y, current_z)
+            obj.Placement = Placement(new_pos, rotation)
+        updated.append(obj_id)
+        touched.append(obj)
+finally:
+    if was_frozen is not None:
+        doc.RecomputesFrozen = was_frozen
+    if touched:
+        # Explicit object list (force, checkCycle) instead of a full-graph
+        # recompute: the moved objects plus everything that depends on them
+        # through expressions or links, so no dependent is left stale
+        to_recompute = {o.Name: o for o in touched}
+        for o in touched:
+            for dependent in o.InListRecursive:
+                to_recompute.setdefault(dependent.Name, dependent)
+        doc.recompute(list(to_recompute.values()), True, True)
+    doc.commitTransaction()
+
+result = {
+    "updated": updated,
+    "errors": errors
+}
+_set_result(result)
+"""
+
+# Creates the document if missing and draws the site boundary for
+# import_sitefit_contract, so both cost a single round trip.
+_SITEFIT_PRELUDE_SRC = SET_SCRIPT_RESULT + POLYLINE_BUILDER + """
+import FreeCAD
+
+doc_name = PARAMS["doc_name"]
+report = {"document": "exists", "boundary": False, "boundary_error": None}
+
+doc = FreeCAD.getDocument(doc_name)
+if not doc:
+    doc = FreeCAD.newDocument(doc_name)
+    report["document"] = "created"
+
+if PARAMS["boundary_mm"]:
+    try:
+        wire = _make_polyline(doc, "SiteBoundary", PARAMS["boundary_mm"], closed=True,
+                              parametric=PARAMS["parametric_wires"])
+        wire.Label = "SiteBoundary"
+        if hasattr(wire.ViewObject, "LineColor"):
+            wire.ViewObject.LineColor = (0.0, 0.5, 0.0)
+        if hasattr(wire.ViewObject, "LineWidth"):
+            wire.ViewObject.LineWidth = 3.0
+        report["boundary"] = True
+    except Exception as e:
+        report["boundary_error"] = str(e)
+
+_set_result(report)
+"""
+
+# Builds equipment, applies placements, draws roads and frames the view for
+# import_sitefit_contract in one round trip with a single final recompute.
+# Equipment specs arrive with dimensions already converted to mm.
+_SITEFIT_BUILD_SRC = SET_SCRIPT_RESULT + FIND_EQUIPMENT_BY_ID + ENVELOPE_BUILDER + POLYLINE_BUILDER + """
+import FreeCAD
+import FreeCADGui
+import Part
+
+doc = FreeCAD.getDocument(PARAMS["doc_name"])
+M_TO_MM = 1000.0
+strict = PARAMS["strict"]
+
+report = {
+    "equipment": [],
+    "stopped": False,
+    "placements": 0,
+    "missing": [],
+    "roads": 0,
+    "errors": [],
+}
+
+
+# 1. Equipment: reuse existing objects matched by EquipmentId first, then by Name.
+# Both are indexed once; doc.getObject per spec would rescan the document.
+by_equipment_id = {}
+by_name = {}
+for o in doc.Objects:
+    equip_id = getattr(o, "EquipmentId", None)
+    if equip_id:
+        by_equipment_id.setdefault(equip_id, o)
+    by_name[o.Name] = o
+
+# Objects found or created for each structure id; placements for these ids
+# reuse them directly instead of looking them up again
+resolved = {}
+
+for spec in PARAMS["equipment"]:
+    struct_id = spec["id"]
+    existing = by_equipment_id.get(struct_id) or by_name.get(struct_id)
+    if existing:
+        resolved[struct_id] = existing
+        report["equipment"].append({"id": struct_id, "status": "exists", "name": existing.Name})
+        continue
+    try:
+        # Box dimensions are pre-swapped based on rotation_deg; the placement
+        # step handles center-to-corner conversion
+        obj = _create_envelope(doc, struct_id, spec)
+        obj.Label = struct_id  # Display name
+        _tag_equipment(obj, struct_id, spec["type"])
+    except Exception as e:
+        report["equipment"].append({"id": struct_id, "status": "error", "error": str(e)})
+        if strict:
+            report["stopped"] = True
+            break
+        continue
+    by_equipment_id[struct_id] = obj
+    by_name[obj.Name] = obj
+    resolved[struct_id] = obj
+    # Accept the object regardless of auto-rename (FreeCAD adds suffix on collision)
+    status = "created" if obj.Name == struct_id else "created_renamed"
+    report["equipment"].append({"id": struct_id, "status": status, "name": obj.Name})
+
+# 2. Placements. The document-wide finder is only built when a placement
+# refers to an object the equipment step did not handle.
+placements = [] if report["stopped"] else PARAMS["placements"]
+find_equipment_by_id = None
+
+for p in placements:
+    # Support both 'id' (contract format) and 'structure_id' (site-fit format)
+    obj_id = p.get("id") or p.get("structure_id")
+    if not obj_id:
+        report["missing"].append("missing_id")
+        continue
+
+    x = p.get("x", 0) * M_TO_MM
+    y = p.get("y", 0) * M_TO_MM
+    rotation_deg = p.get("rotation_deg", 0)
+
+    obj = resolved.get(obj_id)
+    if obj is None:
+        if find_equipment_by_id is None:
+            find_equipment_by_id = _make_equipment_finder(doc)
+        obj = find_equipment_by_id(obj_id)
+    if not obj:
+        report["missing"].append(obj_id)
+        continue
+
+    current_z = obj.Placement.Base.z
+
+    # Create rotation around Z axis
+    rotation = FreeCAD.Rotation(FreeCAD.Vector(0, 0, 1), rotation_deg)
+
+    # For Part::Box (rectangular equipment), calculate corner position
+    # Site-fit provides CENTER coordinates, but FreeCAD Part::Box uses CORNER as origin
+    # FreeCAD Placement rotation happens around Placement.Base (the corner), not geometric center
+    # Formula: Base = center_world - R * center_local
+    if obj.TypeId == "Part::Box":
+        # FreeCAD Part::Box dimensions: Width=X, Length=Y, Height=Z
+        half_x = obj.Width.Value / 2.0
+        half_y = obj.Length.Value / 2.0
+        center_local = FreeCAD.Vector(half_x, half_y, 0)
+
+        # Compute base so that center ends up at (x, y) after rotation
+        center_world = FreeCAD.Vector(x, y, current_z)
+        new_pos = center_world - rotation.multVec(center_local)
+    else:
+        # Cylinders and other shapes are already centered
+        new_pos = FreeCAD.Vector(x, y, current_z)
+
+    obj.Placement = FreeCAD.Placement(new_pos, rotation)
+    report["placements"] += 1
+
+# 3. Roads: centerlines (dashed gray, civil alignment) and edges of pavement (solid black)
+ROAD_STYLES = {
+    "centerline": {"LineColor": (0.5, 0.5, 0.5), "LineWidth": 1.5, "DrawStyle": "Dashed"},
+    "edge": {"LineColor": (0.0, 0.0, 0.0), "LineWidth": 1.0},
+}
+road_wires = [] if report["stopped"] else PARAMS["road_wires"]
+if road_wires:
+    road_layer_name = PARAMS["road_layer_name"]
+    # Keep the created group itself; on a name collision FreeCAD renames it
+    group = doc.addObject("App::DocumentObjectGroup", road_layer_name)
+    group.Label = road_layer_name
+
+parametric_wires = PARAMS["parametric_wires"]
+for wire_spec in road_wires:
+    try:
+        wire = _make_polyline(doc, "Wire", wire_spec["points"], parametric=parametric_wires)
+        wire.Label = wire_spec["label"]
+        for prop, value in ROAD_STYLES[wire_spec["style"]].items():
+            if hasattr(wire.ViewObject, prop):
+                setattr(wire.ViewObject, prop, value)
+        if group:
+            group.addObject(wire)
+    except Exception as e:
+        report["errors"].append(f"Failed to create road wire {wire_spec['label']}: {e}")
+        continue
+    if wire_spec["style"] == "centerline":
+        report["roads"] += 1
+
+# Final recompute and view adjustment, skipped only when the import changed
+# nothing in the document. A strict-mode stop still recomputes, so the
+# boundary (the prelude never recomputes) and the equipment created before
+# the failure are not left stale.
+changed = (
+    PARAMS["boundary_created"]
+    or report["placements"]
+    or report["roads"]
+    or any(item["status"] != "error" for item in report["equipment"])
+)
+if changed:
+    doc.recompute()
+    FreeCADGui.ActiveDocument.ActiveView.viewTop()
+    FreeCADGui.ActiveDocument.ActiveView.fitAll()
+
+_set_result(report)
+"""
+
+# Single-envelope builder for create_equipment_envelope. "kind" selects the
+# geometry (dome, cylinder, building, box); dimensions arrive in mm and
+# "metadata" lists [property, description, value] float properties.
+_ENVELOPE_SRC = ENVELOPE_BUILDER + """
+import FreeCAD
+
+doc_name = PARAMS["doc_name"]
+doc = FreeCAD.getDocument(doc_name)
+if not doc:
+    doc = FreeCAD.newDocument(doc_name)
+
+equipment_id = PARAMS["equipment_id"]
+obj = _create_envelope(doc, equipment_id, PARAMS)
+if PARAMS["kind"] == "box":
+    # Center the box on origin (FreeCAD boxes start at corner)
+    obj.Placement.Base.x = -PARAMS["width_mm"] / 2
+    obj.Placement.Base.y = -PARAMS["length_mm"] / 2
+detail = {"dome": " with dome cover", "building": " with flat roof"}.get(PARAMS["kind"], "")
+
+obj.Label = equipment_id
+
+# Add metadata as properties
+_tag_equipment(obj, equipment_id, PARAMS["equipment_type"])
+for prop, description, value in PARAMS["metadata"]:
+    obj.addProperty("App::PropertyFloat", prop, "ProcessEng", description)
+    setattr(obj, prop, value)
+
+# Recompute only the new object, not the whole document graph
+doc.recompute([obj])
+FreeCADGui.ActiveDocument.ActiveView.fitAll()
+print(f"Created {obj.Name} ({obj.Label}){detail}")
+"""
+
+# One layout-option envelope for the legacy present_layout_options path.
+# base_mm is the Part::Box corner or the round envelope's center.
+_LAYOUT_ENVELOPE_SRC = ENVELOPE_BUILDER + """
+import FreeCAD
+
+doc = FreeCAD.getDocument(PARAMS["doc_name"])
+spec = PARAMS["spec"]
+obj = _create_envelope(doc, spec["id"], spec)
+obj.Label = spec["id"]
+rotation = FreeCAD.Rotation(FreeCAD.Vector(0, 0, 1), PARAMS["rotation_deg"])
+obj.Placement = FreeCAD.Placement(FreeCAD.Vector(*PARAMS["base_mm"]), rotation)
+_tag_equipment(obj, spec["id"], spec["type"])
+print("equip_ok")
+"""
+
+_BOUNDARY_SRC = """
+import FreeCAD
+import Draft
+
+doc_name = PARAMS["doc_name"]
+doc = FreeCAD.getDocument(doc_name)
+if not doc:
+    doc = FreeCAD.newDocument(doc_name)
+
+vectors = [FreeCAD.Vector(*p) for p in PARAMS["points_mm"]]
+
+# Create Draft Wire
+wire = Draft.makeWire(vectors, closed=True, face=False)
+wire.Label = PARAMS["boundary_name"]
+
+# Style the boundary
+if hasattr(wire.ViewObject, "LineColor"):
+    wire.ViewObject.LineColor = (0.0, 0.5, 0.0)  # Green
+if hasattr(wire.ViewObject, "LineWidth"):
+    wire.ViewObject.LineWidth = 3.0
+
+doc.recompute()
+FreeCADGui.ActiveDocument.ActiveView.viewTop()
+FreeCADGui.ActiveDocument.ActiveView.fitAll()
+
+print(f"Created boundary '{wire.Label}' with {len(vectors)} points")
+"""
+
+
+# Recompute a document and frame it from the top; shared by every import
+# and layout tool once its geometry is in place.
+_FIT_VIEW_SRC = """
+import FreeCAD
+import FreeCADGui
+
+doc = FreeCAD.getDocument(PARAMS["doc_name"])
+doc.recompute()
+FreeCADGui.ActiveDocument.ActiveView.viewTop()
+FreeCADGui.ActiveDocument.ActiveView.fitAll()
+print("view_ok")
+"""
+
+# Scripts for import_solutions_as_layers. Each layer is a group holding an
+# Equipment subgroup and, optionally, a Roads subgroup; "Common" holds the
+# shared site boundary.
+_LAYERS_COMMON_SRC = """
+import FreeCAD
+import Draft
+
+doc_name = PARAMS["doc_name"]
+doc = FreeCAD.getDocument(doc_name)
+if not doc:
+    doc = FreeCAD.newDocument(doc_name)
+    print("DOC_STATUS:created")
+else:
+    print("DOC_STATUS:exists")
+
+# Create Common group for shared elements
+common_group = doc.addObject("App::DocumentObjectGroup", "Common")
+common_group.Label = "Common"
+
+if PARAMS["boundary_mm"]:
+    # Create site boundary
+    points = [FreeCAD.Vector(*p) for p in PARAMS["boundary_mm"]]
+    wire = Draft.make_wire(points, closed=True, face=False)
+    wire.Label = "SiteBoundary"
+    common_group.addObject(wire)
+
+print("common_ok")
+"""
+
+_LAYER_GROUP_SRC = """
+import FreeCAD
+
+doc = FreeCAD.getDocument(PARAMS["doc_name"])
+layer_name = PARAMS["layer_name"]
+
+# Create layer group
+layer = doc.addObject("App::DocumentObjectGroup", layer_name)
+layer.Label = layer_name
+
+# Create equipment subgroup
+equip_group = doc.addObject("App::DocumentObjectGroup", layer_name + "_Equipment")
+equip_group.Label = "Equipment"
+layer.addObject(equip_group)
+
+print("layer_ok")
+"""
+
+# One layer equipment object: a Part::Cylinder placed at its center or a
+# Part::Box placed at its (pre-swapped) corner.
+_LAYER_EQUIPMENT_SRC = """
+import FreeCAD
+
+doc = FreeCAD.getDocument(PARAMS["doc_name"])
+equip_group = doc.getObject(PARAMS["layer_name"] + "_Equipment")
+
+if PARAMS["kind"] == "cylinder":
+    obj = doc.addObject("Part::Cylinder", PARAMS["obj_name"])
+    obj.Radius = PARAMS["radius_mm"]
+else:
+    obj = doc.addObject("Part::Box", PARAMS["obj_name"])
+    obj.Width = PARAMS["width_mm"]
+    obj.Length = PARAMS["length_mm"]
+obj.Height = PARAMS["height_mm"]
+obj.Label = PARAMS["label"]
+obj.Placement = FreeCAD.Placement(FreeCAD.Vector(*PARAMS["base_mm"]), FreeCAD.Rotation())
+equip_group.addObject(obj)
+"""
+
+_LAYER_ROADS_GROUP_SRC = """
+import FreeCAD
+
+doc = FreeCAD.getDocument(PARAMS["doc_name"])
+layer = doc.getObject(PARAMS["layer_name"])
+
+# Create roads subgroup
+roads_group = doc.addObject("App::DocumentObjectGroup", PARAMS["roads_group_name"])
+roads_group.Label = "Roads"
+layer.addObject(roads_group)
+print("roads_group_ok")
+"""
+
+# One road polyline (centerline or pavement edge) styled per the caller and
+# filed under the layer's Roads subgroup.
+_LAYER_ROAD_WIRE_SRC = POLYLINE_BUILDER + """
+import FreeCAD
+
+doc = FreeCAD.getDocument(PARAMS["doc_name"])
+wire = _make_polyline(doc, "Wire", PARAMS["points_mm"], parametric=PARAMS.get("parametric_wires", False))
+wire.Label = PARAMS["label"]
+
+if hasattr(wire.ViewObject, "LineColor"):
+    wire.ViewObject.LineColor = tuple(PARAMS["line_color"])
+if hasattr(wire.ViewObject, "LineWidth"):
+    wire.ViewObject.LineWidth = PARAMS["line_width"]
+if hasattr(wire.ViewObject, "DrawStyle"):
+    wire.ViewObject.DrawStyle = PARAMS["draw_style"]
+
+# Add to roads group
+roads_group = doc.getObject(PARAMS["roads_group_name"])
+if roads_group:
+    roads_group.addObject(wire)
 
+print("road_wire_ok")
+"""
 
-def get_rect_dims_at_rotation(w: float, h: float, rotation_deg: int) -> tuple[float, float]:
-    """Get rectangle dimensions adjusted for rotation.
+_LAYER_VISIBILITY_SRC = """
+import FreeCAD
 
-    Site-fit solver uses rotation to swap the axis-aligned bounding box.
-    For rotation 90 or 270, width and height are swapped.
+doc = FreeCAD.getDocument(PARAMS["doc_name"])
+layer = doc.getObject(PARAMS["layer_name"])
+if hasattr(layer, "ViewObject") and layer.ViewObject:
+    layer.ViewObject.Visibility = PARAMS["visible"]
+"""
 
-    Args:
-        w: Original width (X-dimension at rotation=0)
-        h: Original height (Y-dimension at rotation=0)
-        rotation_deg: Rotation in degrees (0, 90, 180, 270)
+# Show one Layout_* group, all of them, or none (leaving only Common).
+_TOGGLE_LAYERS_SRC = """
+import FreeCAD
+import json
 
-    Returns:
-        Tuple of (effective_width, effective_height) for FreeCAD Part::Box
-    """
-    if rotation_deg in (90, 270):
-        return h, w
-    return w, h
+doc_name = PARAMS["doc_name"]
+doc = FreeCAD.getDocument(doc_name)
+if not doc:
+    raise ValueError(f"Document '{doc_name}' not found")
 
+# Get all layer groups (exclude "Common")
+layer_groups = [obj for obj in doc.Objects
+                if obj.TypeId == "App::DocumentObjectGroup"
+                and obj.Name.startswith("Layout_")]
 
-# Phase 1D: Draft API compatibility wrapper snippet
-# Both Draft.makeWire and Draft.make_wire work (they're aliases per DeepWiki),
-# but this wrapper provides insurance against future FreeCAD API changes.
-DRAFT_MAKE_WIRE_COMPAT = """
-def _make_wire_compat(vectors, closed=False, face=False):
-    '''Version-compatible wire creation. Both names work in FreeCAD 0.19+.'''
-    import Draft
-    make_fn = getattr(Draft, 'make_wire', None) or getattr(Draft, 'makeWire')
-    return make_fn(vectors, closed=closed, face=face)
+visible_layer = PARAMS["visible_layer"]
+show_all = PARAMS["show_all"]
+
+updated = []
+for layer in layer_groups:
+    if layer.ViewObject:
+        if show_all:
+            layer.ViewObject.Visibility = True
+            updated.append(f"{layer.Name}: visible")
+        elif visible_layer and layer.Name == visible_layer:
+            layer.ViewObject.Visibility = True
+            updated.append(f"{layer.Name}: visible")
+        elif visible_layer:
+            layer.ViewObject.Visibility = False
+            updated.append(f"{layer.Name}: hidden")
+        else:
+            # No specific layer, hide all
+            layer.ViewObject.Visibility = False
+            updated.append(f"{layer.Name}: hidden")
+
+doc.recompute()
+print(json.dumps({"layers": updated}))
 """
 
+# Scripts for the legacy one-document-per-option present_layout_options path.
+_OPTION_DOC_SRC = """
+import FreeCAD
+
+# Create new document
+doc = FreeCAD.newDocument(PARAMS["doc_name"])
+FreeCAD.setActiveDocument(PARAMS["doc_name"])
+print("doc_created")
+"""
 
-def _extract_json_from_output(output: str) -> dict | None:
-    """Extract a JSON object from FreeCAD command output.
+_OPTION_BOUNDARY_SRC = """
+import FreeCAD
+import Draft
 
-    FreeCAD's execute_code returns output that may have prefix text like:
-    "Python code execution scheduled. \nOutput: {...json...}"
+doc = FreeCAD.getDocument(PARAMS["doc_name"])
+points = [FreeCAD.Vector(*p) for p in PARAMS["points_mm"]]
+wire = Draft.make_wire(points, closed=True, face=False)
+wire.Label = "SiteBoundary"
+print("boundary_ok")
+"""
 
-    This function finds the first complete JSON object in the output.
+# Export one object, or every object with a shape, as glTF/GLB when FreeCAD
+# can write it, otherwise as a combined OBJ mesh next to output_path.
+_EXPORT_GLB_SRC = SET_SCRIPT_RESULT + """
+import FreeCAD
+import Mesh
+import os
 
-    Args:
-        output: Raw output string from FreeCAD
+doc_name = PARAMS["doc_name"]
+doc = FreeCAD.getDocument(doc_name)
+if not doc:
+    raise ValueError(f"Document '{doc_name}' not found")
 
-    Returns:
-        Parsed JSON dict, or None if no valid JSON found
-    """
-    if not output:
-        return None
+obj_name = PARAMS["object_name"]
+output_path = PARAMS["output_path"]
 
-    # Find the first '{' which should start our JSON
-    first_brace = output.find("{")
-    if first_brace < 0:
-        return None
+# Get objects to export
+if obj_name:
+    obj = doc.getObject(obj_name)
+    if not obj:
+        raise ValueError(f"Object '{obj_name}' not found")
+    objects = [obj]
+else:
+    # Export all objects with shapes
+    objects = [o for o in doc.Objects if hasattr(o, "Shape") and not o.Shape.isNull()]
 
-    # Try to parse from this position - json.loads will stop at the end of valid JSON
-    # We need to find where the JSON ends by matching braces
-    candidate = output[first_brace:]
+if not objects:
+    raise ValueError("No exportable objects found")
 
-    # Count braces to find the complete JSON object
-    depth = 0
-    in_string = False
-    escape_next = False
-    json_end = -1
+# Write true glTF/GLB through FreeCAD's own exporter (OCCT glTF writer,
+# FreeCAD 0.20+) when the target asks for it; ImportGui keeps object colors,
+# Import works headless
+export_format = None
+if output_path.lower().endswith((".glb", ".gltf")):
+    # Export to an empty temp file beside the target (same extension, so the
+    # exporter picks the same format) and move it into place only once it
+    # has content: a failed export never touches an existing file
+    import tempfile
+    root, ext = os.path.splitext(output_path)
+    fd, tmp_path = tempfile.mkstemp(suffix=ext, prefix=os.path.basename(root) + ".", dir=os.path.dirname(output_path) or None)
+    os.close(fd)
+    try:
+        for module_name in ("ImportGui", "Import"):
+            try:
+                exporter = __import__(module_name)
+                exporter.export(objects, tmp_path)
+            except Exception as e:
+                print(f"Warning: {module_name} glTF export failed: {e}")
+                continue
+            if os.path.getsize(tmp_path) > 0:
+                os.replace(tmp_path, output_path)
+                export_format = "glb" if ext.lower() == ".glb" else "gltf"
+                export_path = output_path
+                print(f"Exported to: {output_path} ({os.path.getsize(output_path)} bytes)")
+                break
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-    for i, char in enumerate(candidate):
-        if escape_next:
-            escape_next = False
+if export_format is None:
+    # No native glTF writer: tessellate and write OBJ next to output_path
+    def tessellate(shape):
+        try:
+            # Get tessellation with reasonable detail
+            return shape.tessellate(1.0), None  # 1mm tolerance
+        except Exception as e:
+            return None, e
+
+    # Read shapes on this (GUI) thread; tessellation is pure OCCT work that
+    # releases the GIL, so it can run on worker threads
+    shapes = [o.Shape for o in objects]
+
+    # Tessellations of unchanged shapes are reused across export calls; the
+    # cache lives on the FreeCAD module so it outlives this script. hashCode
+    # only buckets entries (it can collide), so each entry keeps the shape it
+    # was built from and a hit must be isEqual to it: same TShape, location
+    # and orientation. Holding that shape also keeps its TShape alive, so a
+    # freed shape's address can't be reused by a different one.
+    mesh_cache = getattr(FreeCAD, "_mcp_mesh_cache", None)
+    if mesh_cache is None:
+        from collections import OrderedDict
+        mesh_cache = FreeCAD._mcp_mesh_cache = OrderedDict()
+    MESH_CACHE_SIZE = 64
+    keys = [(shape.hashCode(), shape.ShapeType) for shape in shapes]
+    tessellations = []
+    for key, shape in zip(keys, shapes):
+        entry = mesh_cache.get(key)
+        tessellations.append(entry[1] if entry is not None and entry[0].isEqual(shape) else None)
+    misses = [i for i, t in enumerate(tessellations) if t is None]
+
+    fresh = None
+    if len(misses) > 1:
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=min(len(misses), os.cpu_count() or 1)) as pool:
+                fresh = list(pool.map(tessellate, [shapes[i] for i in misses]))
+        except Exception as e:
+            print(f"Warning: parallel tessellation failed, retrying sequentially: {e}")
+            fresh = None
+    if fresh is None:
+        fresh = [tessellate(shapes[i]) for i in misses]
+
+    for i, t in zip(misses, fresh):
+        tessellations[i] = t
+        if t[1] is None:
+            mesh_cache[keys[i]] = (shapes[i], t)
+    for key in keys:
+        if key in mesh_cache:
+            mesh_cache.move_to_end(key)
+    while len(mesh_cache) > MESH_CACHE_SIZE:
+        mesh_cache.popitem(last=False)
+
+    # Merge all tessellations into one shared point/facet list so the combined
+    # mesh is built with a single addFacets call instead of repeated addMesh copies
+    all_points = []
+    all_facets = []
+    for obj, (tessellation, error) in zip(objects, tessellations):
+        if error is not None:
+            print(f"Warning: Could not mesh {obj.Name}: {error}")
             continue
+        points, facets = tessellation
+        if points and facets:
+            offset = len(all_points)
+            all_points.extend(points)
+            if offset:
+                all_facets.extend([(a + offset, b + offset, c + offset) for a, b, c in facets])
+            else:
+                all_facets.extend(facets)
 
-        if char == '\\' and in_string:
-            escape_next = True
-            continue
+    if not all_facets:
+        raise ValueError("Could not create any meshes from objects")
 
-        if char == '"' and not escape_next:
-            in_string = not in_string
-            continue
+    combined = Mesh.Mesh()
+    combined.addFacets((all_points, all_facets))
 
-        if in_string:
+    # OBJ fallback; the caller is told how to convert it to GLB
+    obj_path = output_path.replace(".glb", ".obj")
+    combined.write(obj_path)
+    export_format, export_path = "obj", obj_path
+
+    # Verify file was created
+    if os.path.exists(obj_path):
+        file_size = os.path.getsize(obj_path)
+        print(f"Exported to: {obj_path} ({file_size} bytes)")
+    else:
+        print(f"Export failed: file not created at {obj_path}")
+    print(f"Vertices: {combined.CountPoints}")
+    print(f"Faces: {combined.CountFacets}")
+
+_set_result({"format": export_format, "path": export_path})
+"""
+
+# Finalization script for finalize_selected_layout: activates the document,
+# then hides or deletes the other layout layers, closes other option
+# documents, builds the TechDraw plan sheet and exports the PDF in one round
+# trip. Each stage records its own outcome so one failure doesn't mask the rest.
+_FINALIZE_SRC = SET_SCRIPT_RESULT + """
+import FreeCAD
+import os
+
+doc_name = PARAMS["doc_name"]
+result = {
+    "doc_found": False,
+    "layers_hidden": 0,
+    "layers_deleted": 0,
+    "docs_closed": 0,
+    "techdraw_generated": False,
+    "pdf_exported": False,
+    "errors": [],
+}
+
+doc = FreeCAD.getDocument(doc_name)
+if doc:
+    result["doc_found"] = True
+    FreeCAD.setActiveDocument(doc_name)
+
+    # Layer-based workflow: keep the selected Layout_* group, hide or delete the rest
+    layer_name = PARAMS["layer_name"]
+    if layer_name:
+        try:
+            layout_groups = [obj for obj in doc.Objects
+                             if obj.TypeId == "App::DocumentObjectGroup"
+                             and obj.Label.startswith("Layout_")]
+            for group in layout_groups:
+                if group.Label == layer_name:
+                    # Keep selected layer visible
+                    if hasattr(group, "ViewObject") and group.ViewObject:
+                        group.ViewObject.Visibility = True
+                elif PARAMS["delete_other_layers"]:
+                    # Delete the layer and its contents
+                    for child in group.Group:
+                        doc.removeObject(child.Name)
+                    doc.removeObject(group.Name)
+                    result["layers_deleted"] += 1
+                else:
+                    # Just hide
+                    if hasattr(group, "ViewObject") and group.ViewObject:
+                        group.ViewObject.Visibility = False
+                    result["layers_hidden"] += 1
+        except Exception as e:
+            result["errors"].append(f"Layer update failed: {e}")
+
+    # Legacy multi-document workflow: close the other option documents that
+    # are still open (the list is empty in the layer workflow)
+    open_docs = FreeCAD.listDocuments() if PARAMS["close_docs"] else {}
+    for other_doc in PARAMS["close_docs"]:
+        if other_doc not in open_docs:
             continue
+        try:
+            FreeCAD.closeDocument(other_doc)
+            result["docs_closed"] += 1
+        except Exception:
+            pass
+
+    # Suspend main-window repaints while the sheet is built and recomputed, so
+    # the GUI redraws once afterwards instead of on every property change
+    main_window = None
+    if PARAMS["generate_techdraw"] or result["layers_deleted"]:
+        try:
+            import FreeCADGui
+            main_window = FreeCADGui.getMainWindow()
+            main_window.setUpdatesEnabled(False)
+        except Exception:
+            main_window = None  # Headless session: nothing to suspend
 
-        if char == '{':
-            depth += 1
-        elif char == '}':
-            depth -= 1
-            if depth == 0:
-                json_end = i + 1
-                break
+    page = None
+    try:
+        if PARAMS["generate_techdraw"]:
+            try:
+                import TechDraw
+
+                page = doc.addObject("TechDraw::DrawPage", "PlanSheet")
 
-    if json_end > 0:
-        json_str = candidate[:json_end]
-        return json.loads(json_str)
+                # Template resolved by the server; only search when it couldn't see one
+                template_path = PARAMS["template_path"] or next(
+                    (p for p in PARAMS["template_candidates"] if os.path.exists(p)), None
+                )
+                if template_path:
+                    template_obj = doc.addObject("TechDraw::DrawSVGTemplate", "Template")
+                    template_obj.Template = template_path
+                    page.Template = template_obj
+
+                # Collect source objects: filter on TypeId first (one string read per
+                # object), then drop shapeless or null-shaped survivors
+                candidates = [obj for obj in doc.Objects
+                              if obj.TypeId.startswith(("Part::", "PartDesign::", "Sketcher::"))]
+                source_objects = []
+                for obj in candidates:
+                    shape = getattr(obj, "Shape", None)
+                    if shape is not None and not shape.isNull():
+                        source_objects.append(obj)
+                if source_objects:
+                    # Create top view, centered on page. Projection settings go in
+                    # before Source, so their change handlers run on an empty view;
+                    # the single recompute below projects the sources once.
+                    view = doc.addObject("TechDraw::DrawViewPart", "TopView")
+                    view.Direction = FreeCAD.Vector(0, 0, -1)
+                    view.XDirection = FreeCAD.Vector(1, 0, 0)
+                    view.ScaleType = "Custom"
+                    view.Scale = 0.005  # 1:200
+                    view.Source = source_objects
+                    page.addView(view)
+                    view.X = 400
+                    view.Y = 300
+            except Exception as e:
+                page = None
+                result["errors"].append(f"TechDraw generation failed: {e}")
+
+        # One recompute covers the deleted layers and the new TechDraw page; hiding
+        # layers only touches view providers and needs none
+        if page is not None or result["layers_deleted"]:
+            doc.recompute()
+    finally:
+        if main_window is not None:
+            main_window.setUpdatesEnabled(True)
+    result["techdraw_generated"] = page is not None
+
+    if page is not None and PARAMS["export_pdf_path"]:
+        try:
+            import TechDrawGui
+            TechDrawGui.exportPageAsPdf(page, PARAMS["export_pdf_path"])
+            result["pdf_exported"] = True
+        except Exception as e:
+            result["errors"].append(f"PDF export failed: {e}")
 
-    return None
+_set_result(result)
+"""
 
 
 # Contract validation constants
@@ -158,8 +1450,8 @@ def _load_spatial_contract_schema() -> dict | None:
         return None
 
     try:
-        with open(SPATIAL_CONTRACT_V1_SCHEMA_PATH) as f:
-            _SCHEMA_CACHE = json.load(f)
+        with open(SPATIAL_CONTRACT_V1_SCHEMA_PATH, "rb") as f:
+            _SCHEMA_CACHE = _jloads(f.read())
         logger.debug("schema_loaded", path=str(SPATIAL_CONTRACT_V1_SCHEMA_PATH))
         return _SCHEMA_CACHE
     except (json.JSONDecodeError, IOError) as e:
@@ -332,7 +1624,7 @@ def _migrate_contract_to_v1(contract: dict, from_version: str) -> dict:
         migrated["provenance"] = contract["provenance"]
     else:
         migrated["provenance"] = {
-            "generated_at": datetime.utcnow().isoformat() + "Z",
+            "generated_at": _utc_timestamp(),
             "solver_version": "unknown",
         }
 
@@ -349,7 +1641,7 @@ def register_contract_tools(mcp, get_freecad_connection, add_screenshot_if_avail
     """
 
     @mcp.tool()
-    def export_contract_json(
+    async def export_contract_json(
         ctx: Context,
         doc_name: str,
         project_name: str,
@@ -396,184 +1688,15 @@ def register_contract_tools(mcp, get_freecad_connection, add_screenshot_if_avail
         freecad = get_freecad_connection()
 
         try:
-            # Build the extraction code to run in FreeCAD
-            extract_code = f'''
-import FreeCAD
-import json
-import math
-
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    raise ValueError("Document '{doc_name}' not found")
-
-result = {{
-    "project": {{
-        "name": "{project_name}",
-        "crs": "local",
-        "origin": {{"easting": 0, "northing": 0, "elevation": 0}},
-        "rotation_deg": 0,
-        "unit": "m",
-        "version": "1.0.0"
-    }},
-    "site": {{
-        "boundary": [],
-        "keepouts": [],
-        "entrances": []
-    }},
-    "equipment": [],
-    "placements": [],
-    "connections": [],
-    "viz_overrides": [],
-    "metadata": {{
-        "created_at": "{datetime.utcnow().isoformat()}Z",
-        "created_by": "freecad-mcp/export_contract_json",
-        "source_file": doc.FileName if doc.FileName else doc.Name
-    }}
-}}
-
-# Unit conversion factor (mm to m)
-MM_TO_M = 0.001
-
-# Extract site boundary if specified
-boundary_name = "{boundary_object}" if "{boundary_object}" else None
-if boundary_name:
-    boundary_obj = doc.getObject(boundary_name)
-    if boundary_obj and hasattr(boundary_obj, "Points"):
-        # Draft Wire/Polyline has Points property
-        result["site"]["boundary"] = [
-            [p.x * MM_TO_M, p.y * MM_TO_M] for p in boundary_obj.Points
-        ]
-    elif boundary_obj and hasattr(boundary_obj, "Shape"):
-        # Extract from shape vertices
-        verts = boundary_obj.Shape.Vertexes
-        result["site"]["boundary"] = [
-            [v.X * MM_TO_M, v.Y * MM_TO_M] for v in verts
-        ]
-
-# Equipment type mapping based on object type and name patterns
-def infer_equipment_type(obj_name, obj_type):
-    name_lower = obj_name.lower()
-    if "tank" in name_lower or name_lower.startswith("tk"):
-        return "storage_tank"
-    elif "reactor" in name_lower or name_lower.startswith("r-"):
-        return "reactor"
-    elif "pump" in name_lower or name_lower.startswith("p-"):
-        return "pump"
-    elif "clarifier" in name_lower:
-        return "clarifier"
-    elif "thickener" in name_lower:
-        return "thickener"
-    elif "filter" in name_lower:
-        return "filter"
-    elif "blower" in name_lower or name_lower.startswith("bl-"):
-        return "blower"
-    elif "compressor" in name_lower:
-        return "compressor"
-    elif "exchanger" in name_lower or name_lower.startswith("e-"):
-        return "heat_exchanger"
-    elif "column" in name_lower or name_lower.startswith("c-"):
-        return "column"
-    elif "vessel" in name_lower or name_lower.startswith("v-"):
-        return "vessel"
-    elif "basin" in name_lower:
-        return "basin"
-    elif "building" in name_lower:
-        return "building"
-    elif "substation" in name_lower:
-        return "substation"
-    elif "mcc" in name_lower:
-        return "mcc"
-    elif "rack" in name_lower:
-        return "pipe_rack"
-    else:
-        return "other"
-
-# Extract envelope from shape bounding box
-def get_envelope(shape):
-    bbox = shape.BoundBox
-    width = (bbox.XMax - bbox.XMin) * MM_TO_M
-    length = (bbox.YMax - bbox.YMin) * MM_TO_M
-    height = (bbox.ZMax - bbox.ZMin) * MM_TO_M
-
-    # Check if roughly circular (width ~= length)
-    if abs(width - length) < 0.1 * max(width, length):
-        diameter = (width + length) / 2
-        return {{"shape": "circle", "diameter": round(diameter, 3)}}, round(height, 3)
-    else:
-        return {{"shape": "rectangle", "width": round(width, 3), "length": round(length, 3)}}, round(height, 3)
-
-# Extract equipment from all objects in document
-equipment_prefix = "{equipment_prefix}"
-for obj in doc.Objects:
-    # Skip boundary object and non-shape objects
-    if boundary_name and obj.Name == boundary_name:
-        continue
-    if not hasattr(obj, "Shape") or obj.Shape.isNull():
-        continue
-
-    # Skip if prefix specified and doesn't match
-    if equipment_prefix and not obj.Name.startswith(equipment_prefix):
-        continue
-
-    # Skip Draft objects that aren't equipment (wires, dimensions, etc.)
-    obj_type = obj.TypeId
-    if obj_type in ["Draft::Wire", "Draft::Dimension", "Draft::Text", "Draft::Label"]:
-        continue
-
-    # Get envelope and type
-    try:
-        envelope, height = get_envelope(obj.Shape)
-    except:
-        continue
-
-    equip_type = infer_equipment_type(obj.Name, obj_type)
-
-    # Get placement (position in mm, convert to m)
-    placement = obj.Placement
-    pos_x = placement.Base.x * MM_TO_M
-    pos_y = placement.Base.y * MM_TO_M
-    base_elev = placement.Base.z * MM_TO_M
-
-    # Get rotation around Z axis
-    rotation_deg = 0
-    if hasattr(placement.Rotation, "Angle"):
-        axis = placement.Rotation.Axis
-        if abs(axis.z) > 0.9:  # Rotation around Z
-            rotation_deg = math.degrees(placement.Rotation.Angle)
-
-    # Extract parameters from Spreadsheet if linked
-    parameters = {{}}
-    if hasattr(obj, "ExpressionEngine"):
-        for prop, expr in obj.ExpressionEngine:
-            parameters[prop] = expr
-
-    equipment_item = {{
-        "id": obj.Name,
-        "type": equip_type,
-        "envelope": envelope,
-        "height": height,
-        "base_elevation": round(base_elev, 3),
-        "truth_ref": f"FreeCAD::{{doc.Name}}::{{obj.Name}}",
-        "clearances": {{
-            "maintenance": 2.0,
-            "operation": 1.5
-        }}
-    }}
-
-    # Add parameters if any
-    if parameters:
-        equipment_item["parameters"] = parameters
-
-    result["equipment"].append(equipment_item)
-
-# Compute content hash for reproducibility tracking
-content_str = json.dumps(result["equipment"], sort_keys=True)
-result["metadata"]["hash"] = "sha256:" + __import__("hashlib").sha256(content_str.encode()).hexdigest()[:16]
-
-print(json.dumps(result))
-'''
-
-            res = freecad.execute_code(extract_code)
+            # Run the extraction script in FreeCAD; off the event loop so other
+            # tool calls aren't blocked behind the RPC
+            res = await asyncio.to_thread(freecad.execute_code, _EXTRACT_SRC, {
+                "doc_name": doc_name,
+                "project_name": project_name,
+                "created_at": _utc_timestamp(),
+                "boundary_object": boundary_object or "",
+                "equipment_prefix": equipment_prefix or "",
+            })
 
             if not res.get("success"):
                 return [TextContent(type="text", text=f"Failed to extract contract: {res.get('error', 'Unknown error')}")]
@@ -581,12 +1704,11 @@ print(json.dumps(result))
             # Parse the JSON from the output
             output = res.get("message", "")
 
-            # Find the JSON in the output - FreeCAD output may have prefix text
-            # We need to find the first complete JSON object
+            # The contract comes back through the addon's result channel
             try:
-                contract = _extract_json_from_output(output)
+                contract = _script_result(res)
                 if contract is None:
-                    return [TextContent(type="text", text=f"Could not find valid JSON in output: {output}")]
+                    return [TextContent(type="text", text=f"Extraction script returned no contract: {output}")]
             except json.JSONDecodeError as e:
                 return [TextContent(type="text", text=f"Failed to parse contract JSON: {e}\nOutput: {output}")]
 
@@ -600,17 +1722,16 @@ print(json.dumps(result))
                 if parent_dir:
                     os.makedirs(parent_dir, exist_ok=True)
 
-                with open(output_path, "w") as f:
-                    json.dump(contract, f, indent=2)
-
-                # Verify file was created
-                if os.path.exists(output_path):
-                    file_size = os.path.getsize(output_path)
+                # Serialization and the write run on a worker thread while the
+                # screenshot (if requested) is fetched
+                screenshot_task = asyncio.create_task(asyncio.to_thread(freecad.get_active_screenshot)) if include_screenshot else None
+                try:
+                    file_size = await asyncio.to_thread(_atomic_write_json, output_path, contract, True)
                     msg = f"Contract exported to: {output_path} ({file_size} bytes)"
-                else:
-                    msg = f"Contract export failed: file not created at {output_path}"
+                except OSError as e:
+                    msg = f"Contract export failed: could not write {output_path}: {e}"
 
-                screenshot = freecad.get_active_screenshot()
+                screenshot = await screenshot_task if screenshot_task else None
                 response = [
                     TextContent(type="text", text=f"{msg}\n"
                                f"Equipment count: {len(contract['equipment'])}\n"
@@ -620,9 +1741,10 @@ print(json.dumps(result))
             else:
                 # Return JSON in response, filtered by detail_level
                 filtered_contract = filter_contract_response(contract, detail_level)
-                screenshot = freecad.get_active_screenshot()
+                screenshot = await asyncio.to_thread(freecad.get_active_screenshot) if include_screenshot else None
                 response = [
-                    TextContent(type="text", text=json.dumps(filtered_contract, indent=2))
+                    # Pretty-print only for "full"; compact responses are for machine consumers
+                    TextContent(type="text", text=_jdumps(filtered_contract, indent=detail_level == "full").decode())
                 ]
                 return add_screenshot_if_available(response, screenshot, include_screenshot)
 
@@ -675,14 +1797,14 @@ print(json.dumps(result))
         try:
             # Load contract from file, dict, or string
             if contract_path:
-                with open(contract_path, "r") as f:
-                    contract = json.load(f)
+                with open(contract_path, "rb") as f:
+                    contract = _jloads(f.read())
             elif contract_json:
                 # Handle both dict (from MCP parsing) and string
                 if isinstance(contract_json, dict):
                     contract = contract_json
                 else:
-                    contract = json.loads(contract_json)
+                    contract = _jloads(contract_json)
             else:
                 return [TextContent(type="text", text="Either contract_json or contract_path must be provided")]
 
@@ -690,90 +1812,8 @@ print(json.dumps(result))
             if not placements:
                 return [TextContent(type="text", text="No placements found in contract")]
 
-            # Build code to apply placements
-            apply_code = f'''
-import FreeCAD
-import math
-
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    raise ValueError("Document '{doc_name}' not found")
-
-# Unit conversion (m to mm)
-M_TO_MM = 1000.0
-
-def find_equipment_by_id(doc, equip_id):
-    """Find equipment by EquipmentId property first (survives name collisions)."""
-    # First, try EquipmentId custom property
-    for obj in doc.Objects:
-        if getattr(obj, "EquipmentId", None) == equip_id:
-            return obj
-    # Fallback to normalized Name (FreeCAD converts hyphens to underscores)
-    normalized_id = equip_id.replace("-", "_")
-    obj = doc.getObject(normalized_id)
-    if obj:
-        return obj
-    # Fallback to Label search
-    matches = doc.getObjectsByLabel(equip_id)
-    if len(matches) == 1:
-        return matches[0]
-    return None
-
-placements = {json.dumps(placements)}
-updated = []
-errors = []
-
-for p in placements:
-    # Support both 'id' (contract format) and 'structure_id' (site-fit format)
-    obj_id = p.get("id") or p.get("structure_id")
-    if not obj_id:
-        errors.append("Placement missing both 'id' and 'structure_id'")
-        continue
-
-    x = p.get("x", 0) * M_TO_MM  # Convert m to mm
-    y = p.get("y", 0) * M_TO_MM
-    rotation_deg = p.get("rotation_deg", 0)
-
-    obj = find_equipment_by_id(doc, obj_id)
-    if not obj:
-        errors.append(f"Object '{{obj_id}}' not found")
-        continue
-
-    # Get current Z position to preserve elevation
-    current_z = obj.Placement.Base.z
-
-    # For Part::Box (rectangular equipment), dimensions are pre-swapped during creation
-    # based on rotation_deg, so we use simple center-to-corner offset (no FreeCAD rotation)
-    # Site-fit provides CENTER coordinates, but FreeCAD Part::Box uses CORNER as origin
-    if obj.TypeId == "Part::Box":
-        # FreeCAD Part::Box dimensions: Width=X, Length=Y, Height=Z
-        # These are already swapped for 90/270 rotation during equipment creation
-        half_x = obj.Width.Value / 2.0
-        half_y = obj.Length.Value / 2.0
-
-        # Simple center-to-corner offset (no rotation - dimensions pre-swapped)
-        new_pos = FreeCAD.Vector(x - half_x, y - half_y, current_z)
-
-        # No rotation needed - dimensions are pre-swapped based on rotation_deg
-        obj.Placement = FreeCAD.Placement(new_pos, FreeCAD.Rotation())
-    else:
-        # Cylinders and other shapes are already centered
-        # Apply rotation for non-rectangular shapes (though circles don't care about rotation)
-        rotation = FreeCAD.Rotation(FreeCAD.Vector(0, 0, 1), rotation_deg)
-        new_pos = FreeCAD.Vector(x, y, current_z)
-        obj.Placement = FreeCAD.Placement(new_pos, rotation)
-    updated.append(obj_id)
-
-doc.recompute()
-
-result = {{
-    "updated": updated,
-    "errors": errors
-}}
-print(__import__("json").dumps(result))
-'''
-
-            res = freecad.execute_code(apply_code)
+            # Run the placement script in FreeCAD
+            res = freecad.execute_code(_APPLY_SRC, {"doc_name": doc_name, "placements": placements})
 
             if not res.get("success"):
                 return [TextContent(type="text", text=f"Failed to apply placements: {res.get('error', 'Unknown error')}")]
@@ -781,21 +1821,20 @@ print(__import__("json").dumps(result))
             # Parse result
             output = res.get("message", "")
             try:
-                result = _extract_json_from_output(output)
+                result = _script_result(res)
                 if result is None:
-                    result = {"updated": [], "errors": [f"Could not parse output: {output}"]}
+                    result = {"updated": [], "errors": [f"Apply script returned no result: {output}"]}
             except json.JSONDecodeError:
                 result = {"updated": [], "errors": [f"JSON parse error: {output}"]}
 
-            screenshot = freecad.get_active_screenshot()
+            screenshot = freecad.get_active_screenshot() if include_screenshot else None
 
-            status_msg = f"Applied placements:\n- Updated: {len(result.get('updated', []))} objects"
+            status_lines = ["Applied placements:", f"- Updated: {len(result.get('updated', []))} objects"]
             if result.get('errors'):
-                status_msg += f"\n- Errors: {len(result['errors'])}"
-                for err in result['errors'][:5]:  # Show first 5 errors
-                    status_msg += f"\n  - {err}"
+                status_lines.append(f"- Errors: {len(result['errors'])}")
+                status_lines.extend(f"  - {err}" for err in result['errors'][:5])  # Show first 5 errors
 
-            response = [TextContent(type="text", text=status_msg)]
+            response = [TextContent(type="text", text="\n".join(status_lines))]
             return add_screenshot_if_available(response, screenshot, include_screenshot)
 
         except Exception as e:
@@ -859,91 +1898,35 @@ print(__import__("json").dumps(result))
             if parent_dir:
                 os.makedirs(parent_dir, exist_ok=True)
 
-            # Build export code
-            obj_filter = f'obj_name = "{object_name}"' if object_name else 'obj_name = None'
-
-            export_code = f'''
-import FreeCAD
-import Mesh
-import os
-import tempfile
-
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    raise ValueError("Document '{doc_name}' not found")
-
-{obj_filter}
-output_path = r"{output_path}"
-
-# Get objects to export
-if obj_name:
-    obj = doc.getObject(obj_name)
-    if not obj:
-        raise ValueError(f"Object '{{obj_name}}' not found")
-    objects = [obj]
-else:
-    # Export all objects with shapes
-    objects = [o for o in doc.Objects if hasattr(o, "Shape") and not o.Shape.isNull()]
-
-if not objects:
-    raise ValueError("No exportable objects found")
-
-# Create mesh from shapes
-meshes = []
-for obj in objects:
-    try:
-        # Tessellate shape to mesh
-        shape = obj.Shape
-        mesh = Mesh.Mesh()
-        # Get tessellation with reasonable detail
-        tessellation = shape.tessellate(1.0)  # 1mm tolerance
-        if tessellation[0] and tessellation[1]:
-            mesh.addFacets(tessellation)
-            meshes.append(mesh)
-    except Exception as e:
-        print(f"Warning: Could not mesh {{obj.Name}}: {{e}}")
-
-if not meshes:
-    raise ValueError("Could not create any meshes from objects")
-
-# Combine all meshes
-combined = Mesh.Mesh()
-for m in meshes:
-    combined.addMesh(m)
-
-# Export to GLB (FreeCAD exports to glTF/GLB via Mesh workbench)
-# Note: FreeCAD's native export might be OBJ/STL, may need addon for GLB
-# For now, export as OBJ and note that conversion may be needed
-obj_path = output_path.replace(".glb", ".obj")
-combined.write(obj_path)
-
-# Verify file was created
-if os.path.exists(obj_path):
-    file_size = os.path.getsize(obj_path)
-    print(f"Exported to: {{obj_path}} ({{file_size}} bytes)")
-else:
-    print(f"Export failed: file not created at {{obj_path}}")
-print(f"Vertices: {{combined.CountPoints}}")
-print(f"Faces: {{combined.CountFacets}}")
-'''
-
-            res = freecad.execute_code(export_code)
+            res = freecad.execute_code(_EXPORT_GLB_SRC, {
+                "doc_name": doc_name,
+                "object_name": object_name,
+                "output_path": output_path,
+            })
 
             if not res.get("success"):
                 return [TextContent(type="text", text=f"Failed to export: {res.get('error', 'Unknown error')}")]
 
             output = res.get("message", "")
-
-            # Note: FreeCAD may export OBJ instead of GLB natively
-            # The actual path might be .obj
-            actual_path = output_path.replace(".glb", ".obj") if ".glb" in output_path else output_path
-
-            screenshot = freecad.get_active_screenshot()
-            response = [
-                TextContent(type="text", text=f"Mesh exported:\n{output}\n\n"
-                           f"Note: FreeCAD exports OBJ natively. For GLB conversion, use:\n"
-                           f"  blender --background --python-expr \"import bpy; bpy.ops.import_scene.obj(filepath='{actual_path}'); bpy.ops.export_scene.gltf(filepath='{output_path}')\"")
-            ]
+            try:
+                export = _script_result(res) or {}
+            except json.JSONDecodeError:
+                export = {}
+
+            text_lines = ["Mesh exported:", output]
+            if export.get("format") not in ("glb", "gltf"):
+                # FreeCAD had no glTF writer and fell back to OBJ
+                actual_path = export.get("path") or (
+                    output_path.replace(".glb", ".obj") if ".glb" in output_path else output_path
+                )
+                text_lines.extend((
+                    "",
+                    "Note: FreeCAD exported OBJ. For GLB conversion, use:",
+                    f"  blender --background --python-expr \"import bpy; bpy.ops.import_scene.obj(filepath='{actual_path}'); bpy.ops.export_scene.gltf(filepath='{output_path}')\"",
+                ))
+
+            screenshot = freecad.get_active_screenshot() if include_screenshot else None
+            response = [TextContent(type="text", text="\n".join(text_lines))]
             return add_screenshot_if_available(response, screenshot, include_screenshot)
 
         except Exception as e:
@@ -1014,106 +1997,37 @@ print(f"Faces: {{combined.CountFacets}}")
 
         try:
             # Convert meters to mm for FreeCAD
-            height_mm = height * M_TO_MM
+            params = {
+                "doc_name": doc_name,
+                "equipment_id": equipment_id,
+                "equipment_type": equipment_type,
+                "height_mm": height * M_TO_MM,
+            }
 
-            # Digester types that get dome covers
-            digester_types = ["digester", "anaerobic_digester", "anmbr", "gas_holder"]
-            # Building types that get flat roofs
-            building_types = ["building", "control_building", "biogas_building", "pump_station",
-                             "blower_building", "mcc_building", "dewatering_building", "uv_building",
-                             "chemical_building", "screen_building"]
+            type_key = equipment_type.casefold()
 
             if shape == "circle":
                 if not diameter:
                     return [TextContent(type="text", text="diameter is required for circle shape")]
-                radius_mm = (diameter / 2) * M_TO_MM
+                params["radius_mm"] = (diameter / 2) * M_TO_MM
 
                 # Check if this is a digester type that needs a dome cover
-                is_digester = equipment_type.lower() in digester_types
-
-                if is_digester:
+                if type_key in DOME_COVER_TYPES:
                     # Digester with dome cover
-                    # Dome height ratio: 6m cover / 40m diameter = 0.15
-                    DOME_RATIO = 0.15
-                    dome_height_mm = diameter * DOME_RATIO * M_TO_MM
-                    tank_height_mm = height_mm  # height parameter IS the shell height; dome added on top
-
-                    create_code = f'''
-import FreeCAD
-import Part
-import math
-
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    doc = FreeCAD.newDocument("{doc_name}")
-
-# Create tank body (cylinder)
-tank = doc.addObject("Part::Cylinder", "{equipment_id}_tank")
-tank.Radius = {radius_mm}
-tank.Height = {tank_height_mm}
-tank.Label = "{equipment_id}_tank"
-
-# Create dome cover using Part::Ellipsoid (flattened hemisphere)
-# Radius1 = Z height, Radius2 = X radius, Radius3 = Y radius
-dome = doc.addObject("Part::Ellipsoid", "{equipment_id}_dome")
-dome.Radius1 = {dome_height_mm}  # Z-direction (dome height)
-dome.Radius2 = {radius_mm}       # X-direction (horizontal radius)
-dome.Radius3 = {radius_mm}       # Y-direction (horizontal radius)
-dome.Angle1 = 0                  # Start at equator
-dome.Angle2 = 90                 # End at top (hemisphere)
-dome.Angle3 = 360                # Full rotation
-dome.Label = "{equipment_id}_dome"
-
-# Position dome on top of tank
-dome.Placement.Base.z = {tank_height_mm}
-
-# Create compound to group them
-compound = doc.addObject("Part::Compound", "{equipment_id}")
-compound.Links = [tank, dome]
-compound.Label = "{equipment_id}"
-
-# Add metadata as properties
-compound.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
-compound.EquipmentType = "{equipment_type}"
-compound.addProperty("App::PropertyFloat", "DiameterM", "ProcessEng", "Diameter in meters")
-compound.DiameterM = {diameter}
-compound.addProperty("App::PropertyFloat", "HeightM", "ProcessEng", "Total height in meters")
-compound.HeightM = {height}
-compound.addProperty("App::PropertyFloat", "DomeHeightM", "ProcessEng", "Dome height in meters")
-compound.DomeHeightM = {diameter * DOME_RATIO}
-
-doc.recompute()
-FreeCADGui.ActiveDocument.ActiveView.fitAll()
-print(f"Created {{compound.Name}} ({{compound.Label}}) with dome cover")
-'''
+                    params["kind"] = "dome"
+                    params["dome_height_mm"] = diameter * DOME_RATIO * M_TO_MM
+                    params["metadata"] = [
+                        ["DiameterM", "Diameter in meters", diameter],
+                        ["HeightM", "Total height in meters", height],
+                        ["DomeHeightM", "Dome height in meters", diameter * DOME_RATIO],
+                    ]
                 else:
                     # Standard circular tank (no dome)
-                    create_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    doc = FreeCAD.newDocument("{doc_name}")
-
-# Create cylinder for circular tank
-cylinder = doc.addObject("Part::Cylinder", "{equipment_id}")
-cylinder.Radius = {radius_mm}
-cylinder.Height = {height_mm}
-cylinder.Label = "{equipment_id}"
-
-# Add metadata as properties
-cylinder.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
-cylinder.EquipmentType = "{equipment_type}"
-cylinder.addProperty("App::PropertyFloat", "DiameterM", "ProcessEng", "Diameter in meters")
-cylinder.DiameterM = {diameter}
-cylinder.addProperty("App::PropertyFloat", "HeightM", "ProcessEng", "Height in meters")
-cylinder.HeightM = {height}
-
-doc.recompute()
-FreeCADGui.ActiveDocument.ActiveView.fitAll()
-print(f"Created {{cylinder.Name}} ({{cylinder.Label}})")
-'''
+                    params["kind"] = "cylinder"
+                    params["metadata"] = [
+                        ["DiameterM", "Diameter in meters", diameter],
+                        ["HeightM", "Height in meters", height],
+                    ]
             elif shape == "rectangle":
                 if not width or not length:
                     return [TextContent(type="text", text="width and length are required for rectangle shape")]
@@ -1124,112 +2038,35 @@ print(f"Created {{cylinder.Name}} ({{cylinder.Label}})")
                 else:
                     eff_width, eff_length = width, length
 
-                width_mm = eff_width * M_TO_MM
-                length_mm = eff_length * M_TO_MM
+                params["width_mm"] = eff_width * M_TO_MM
+                params["length_mm"] = eff_length * M_TO_MM
+                params["metadata"] = [
+                    ["WidthM", "Width in meters", width],
+                    ["LengthM", "Length in meters", length],
+                    ["HeightM", "Height in meters", height],
+                ]
 
                 # Check if this is a building type that needs a roof
-                is_building = equipment_type.lower() in building_types
-
-                if is_building:
+                if type_key in BUILDING_TYPES:
                     # Building with flat roof and overhang
                     ROOF_THICKNESS_MM = 300  # 300mm roof slab
                     OVERHANG_MM = 200  # 200mm overhang
-                    wall_height_mm = height_mm - ROOF_THICKNESS_MM
-
-                    create_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    doc = FreeCAD.newDocument("{doc_name}")
-
-# Create walls (main building body)
-walls = doc.addObject("Part::Box", "{equipment_id}_walls")
-walls.Width = {width_mm}    # X dimension (matches contract w)
-walls.Length = {length_mm}  # Y dimension (matches contract h)
-walls.Height = {wall_height_mm}
-walls.Label = "{equipment_id}_walls"
-
-# Center walls on origin
-walls.Placement.Base.x = -{width_mm / 2}
-walls.Placement.Base.y = -{length_mm / 2}
-
-# Create flat roof slab with overhang
-roof = doc.addObject("Part::Box", "{equipment_id}_roof")
-roof.Width = {width_mm} + 2 * {OVERHANG_MM}    # X dimension
-roof.Length = {length_mm} + 2 * {OVERHANG_MM}  # Y dimension
-roof.Height = {ROOF_THICKNESS_MM}
-roof.Label = "{equipment_id}_roof"
-
-# Position roof on top of walls, centered with overhang
-roof.Placement.Base.x = -{width_mm / 2} - {OVERHANG_MM}
-roof.Placement.Base.y = -{length_mm / 2} - {OVERHANG_MM}
-roof.Placement.Base.z = {wall_height_mm}
-
-# Create compound to group them
-compound = doc.addObject("Part::Compound", "{equipment_id}")
-compound.Links = [walls, roof]
-compound.Label = "{equipment_id}"
-
-# Add metadata as properties
-compound.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
-compound.EquipmentType = "{equipment_type}"
-compound.addProperty("App::PropertyFloat", "WidthM", "ProcessEng", "Width in meters")
-compound.WidthM = {width}
-compound.addProperty("App::PropertyFloat", "LengthM", "ProcessEng", "Length in meters")
-compound.LengthM = {length}
-compound.addProperty("App::PropertyFloat", "HeightM", "ProcessEng", "Height in meters")
-compound.HeightM = {height}
-
-doc.recompute()
-FreeCADGui.ActiveDocument.ActiveView.fitAll()
-print(f"Created {{compound.Name}} ({{compound.Label}}) with flat roof")
-'''
+                    params["kind"] = "building"
+                    params["roof_thickness_mm"] = ROOF_THICKNESS_MM
+                    params["overhang_mm"] = OVERHANG_MM
+                    params["wall_height_mm"] = params["height_mm"] - ROOF_THICKNESS_MM
                 else:
                     # Standard rectangular equipment (no roof)
-                    create_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    doc = FreeCAD.newDocument("{doc_name}")
-
-# Create box for rectangular equipment
-box = doc.addObject("Part::Box", "{equipment_id}")
-box.Width = {width_mm}    # X dimension (matches contract w)
-box.Length = {length_mm}  # Y dimension (matches contract h)
-box.Height = {height_mm}
-box.Label = "{equipment_id}"
-
-# Center the box on origin (FreeCAD boxes start at corner)
-box.Placement.Base.x = -{width_mm / 2}
-box.Placement.Base.y = -{length_mm / 2}
-
-# Add metadata as properties
-box.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
-box.EquipmentType = "{equipment_type}"
-box.addProperty("App::PropertyFloat", "WidthM", "ProcessEng", "Width in meters")
-box.WidthM = {width}
-box.addProperty("App::PropertyFloat", "LengthM", "ProcessEng", "Length in meters")
-box.LengthM = {length}
-box.addProperty("App::PropertyFloat", "HeightM", "ProcessEng", "Height in meters")
-box.HeightM = {height}
-
-doc.recompute()
-FreeCADGui.ActiveDocument.ActiveView.fitAll()
-print(f"Created {{box.Name}} ({{box.Label}})")
-'''
+                    params["kind"] = "box"
             else:
                 return [TextContent(type="text", text=f"Unknown shape: {shape}. Use 'rectangle' or 'circle'")]
 
-            res = freecad.execute_code(create_code)
+            res = freecad.execute_code(_ENVELOPE_SRC, params)
 
             if not res.get("success"):
                 return [TextContent(type="text", text=f"Failed to create envelope: {res.get('error', 'Unknown error')}")]
 
-            screenshot = freecad.get_active_screenshot()
+            screenshot = freecad.get_active_screenshot() if include_screenshot else None
 
             dims = f"diameter={diameter}m" if shape == "circle" else f"width={width}m, length={length}m"
             response = [
@@ -1280,43 +2117,24 @@ print(f"Created {{box.Name}} ({{box.Label}})")
         freecad = get_freecad_connection()
 
         try:
-            # Convert points to mm for FreeCAD
-            points_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in boundary_points]
-
-            create_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    doc = FreeCAD.newDocument("{doc_name}")
-
-points = {json.dumps(points_mm)}
-vectors = [FreeCAD.Vector(p[0], p[1], 0) for p in points]
-
-# Create Draft Wire
-wire = Draft.makeWire(vectors, closed=True, face=False)
-wire.Label = "{boundary_name}"
-
-# Style the boundary
-if hasattr(wire.ViewObject, "LineColor"):
-    wire.ViewObject.LineColor = (0.0, 0.5, 0.0)  # Green
-if hasattr(wire.ViewObject, "LineWidth"):
-    wire.ViewObject.LineWidth = 3.0
+            validate_points(boundary_points, "boundary_points", min_points=3)
+        except ValueError as e:
+            return [TextContent(type="text", text=f"Invalid boundary: {e}")]
 
-doc.recompute()
-FreeCADGui.ActiveDocument.ActiveView.viewTop()
-FreeCADGui.ActiveDocument.ActiveView.fitAll()
-
-print(f"Created boundary '{{wire.Label}}' with {{len(vectors)}} points")
-'''
+        try:
+            # Convert points to mm for FreeCAD
+            points_mm = scale_points(boundary_points, M_TO_MM, z=0.0, ndigits=MM_DECIMALS)
 
-            res = freecad.execute_code(create_code)
+            res = freecad.execute_code(_BOUNDARY_SRC, {
+                "doc_name": doc_name,
+                "points_mm": points_mm,
+                "boundary_name": boundary_name,
+            })
 
             if not res.get("success"):
                 return [TextContent(type="text", text=f"Failed to create boundary: {res.get('error', 'Unknown error')}")]
 
-            screenshot = freecad.get_active_screenshot()
+            screenshot = freecad.get_active_screenshot() if include_screenshot else None
             response = [
                 TextContent(type="text", text=f"Created site boundary:\n"
                            f"  Name: {boundary_name}\n"
@@ -1340,6 +2158,7 @@ print(f"Created boundary '{{wire.Label}}' with {{len(vectors)}} points")
         apply_placements_flag: bool = True,
         road_layer_name: str = "RoadCenterlines",
         strict: bool = False,
+        parametric_wires: bool = False,
         include_screenshot: bool = False,
         detail_level: DetailLevel = "compact",
     ) -> list[TextContent | ImageContent]:
@@ -1352,12 +2171,14 @@ print(f"Created boundary '{{wire.Label}}' with {{len(vectors)}} points")
         Args:
             doc_name: Name for the FreeCAD document (created if doesn't exist)
             contract_json: Contract JSON from sitefit_export_contract (string or dict)
-            create_boundary: Create site boundary Draft Wire (default: True)
-            create_roads: Create road centerlines as Draft Wires (default: True)
+            create_boundary: Create site boundary wire (default: True)
+            create_roads: Create road centerlines as wires (default: True)
             create_equipment: Create equipment envelopes (default: True)
             apply_placements_flag: Apply solved placements to equipment (default: True)
             road_layer_name: Group name for road centerlines (default: "RoadCenterlines")
             strict: Fail immediately on first equipment creation error (default: False)
+            parametric_wires: Draw boundary and roads as editable Draft Wires instead of
+                plain Part polylines (default: False, faster for large road networks)
 
         Returns:
             Summary of imported components
@@ -1380,7 +2201,7 @@ print(f"Created boundary '{{wire.Label}}' with {{len(vectors)}} points")
         try:
             # Parse contract
             if isinstance(contract_json, str):
-                contract = json.loads(contract_json)
+                contract = _jloads(contract_json)
             else:
                 contract = contract_json
 
@@ -1400,10 +2221,16 @@ print(f"Created boundary '{{wire.Label}}' with {{len(vectors)}} points")
             site_data = contract.get("site", {})
             program_data = contract.get("program", {})
             placements_data = contract.get("placements", [])
+            placement_by_id = _index_placements(placements_data, keys=("id",))
             road_network = contract.get("road_network")
 
             structures = program_data.get("structures", [])
             boundary = site_data.get("boundary", [])
+            if create_boundary and boundary:
+                try:
+                    validate_points(boundary, "site.boundary", min_points=3)
+                except ValueError as e:
+                    return [TextContent(type="text", text=f"Invalid boundary: {e}")]
 
             # Track results
             results = {
@@ -1415,54 +2242,34 @@ print(f"Created boundary '{{wire.Label}}' with {{len(vectors)}} points")
                 "errors": []
             }
 
-            # 1. Create document if it doesn't exist (with structured sentinel)
-            doc_check = f'''
-import FreeCAD
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    doc = FreeCAD.newDocument("{doc_name}")
-    print("DOC_STATUS:created")
-else:
-    print("DOC_STATUS:exists")
-'''
-            res = freecad.execute_code(doc_check)
+            # 1-2. Create document if it doesn't exist and add the boundary
+            # in one round-trip
+            boundary_mm = scale_points(boundary, M_TO_MM, z=0.0, ndigits=MM_DECIMALS) if create_boundary and boundary else []
+            res = freecad.execute_code(_SITEFIT_PRELUDE_SRC, {
+                "doc_name": doc_name,
+                "boundary_mm": boundary_mm,
+                "parametric_wires": parametric_wires,
+            })
             msg = res.get("message", "")
-            if not res.get("success", True) or "DOC_STATUS:" not in msg:
+            try:
+                prelude = _script_result(res) if res.get("success") else None
+            except json.JSONDecodeError:
+                prelude = None
+            if prelude is None:
                 results["document"] = False
                 error_detail = res.get("error", msg or "Unknown error")
                 results["errors"].append(f"Failed to create/find document: {error_detail}")
                 return [TextContent(type="text", text=f"Document creation failed: {error_detail}")]
             results["document"] = True
-
-            # 2. Create boundary if requested
-            if create_boundary and boundary:
-                points_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in boundary]
-                boundary_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-points = {json.dumps(points_mm)}
-vectors = [FreeCAD.Vector(p[0], p[1], 0) for p in points]
-wire = Draft.makeWire(vectors, closed=True, face=False)
-wire.Label = "SiteBoundary"
-if hasattr(wire.ViewObject, "LineColor"):
-    wire.ViewObject.LineColor = (0.0, 0.5, 0.0)
-if hasattr(wire.ViewObject, "LineWidth"):
-    wire.ViewObject.LineWidth = 3.0
-doc.recompute()
-print("boundary_ok")
-'''
-                res = freecad.execute_code(boundary_code)
-                if "boundary_ok" in res.get("message", ""):
-                    results["boundary"] = 1
-
-            # 3. Create equipment envelopes if requested
-            # Digester types that get dome covers (same list as create_equipment_envelope)
-            digester_types = ["digester", "anaerobic_digester", "reactor", "cstr",
-                              "uasb", "egsb", "ic_reactor", "membrane_bioreactor"]
-            DOME_RATIO = 0.15  # Fallback: 6m cover / 40m diameter
-
+            if prelude["boundary"]:
+                results["boundary"] = 1
+            elif prelude["boundary_error"]:
+                results["errors"].append(f"Failed to create boundary: {prelude['boundary_error']}")
+
+            # 3-6. Equipment envelopes, placements, road geometry and the final
+            # view are handled by one batched script (_SITEFIT_BUILD_SRC) with a
+            # single recompute.
+            equipment_specs = []
             if create_equipment and structures:
                 for struct in structures:
                     struct_id = struct.get("id", "")
@@ -1471,440 +2278,121 @@ print("boundary_ok")
                     struct_height = struct.get("height", 5.0)
                     dome_height_m = struct.get("dome_height_m")  # May be None
                     shape_type = footprint.get("shape", "rect")
+                    spec = {"id": struct_id, "type": struct_type, "height_mm": struct_height * M_TO_MM}
 
                     if shape_type == "circle":
                         diameter = footprint.get("d", 10.0)
-                        radius_mm = (diameter / 2) * M_TO_MM
-                        height_mm = struct_height * M_TO_MM
-
-                        # Check if this is a digester type that needs a dome cover
-                        is_digester = struct_type.lower() in digester_types
-
-                        if is_digester:
-                            # Determine dome height: prefer explicit, fallback to ratio
-                            if dome_height_m is not None:
-                                dome_height_mm = dome_height_m * M_TO_MM
-                            else:
-                                dome_height_mm = diameter * DOME_RATIO * M_TO_MM
-
-                            tank_height_mm = height_mm  # height parameter IS the shell height; dome added on top
-
-                            equip_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-
-# Check for existing equipment by EquipmentId property first, then by Name
-existing = None
-for obj in doc.Objects:
-    if getattr(obj, "EquipmentId", None) == "{struct_id}":
-        existing = obj
-        break
-if not existing:
-    existing = doc.getObject("{struct_id}")
-
-if existing:
-    print("EQUIP_STATUS:exists:{struct_id}:" + existing.Name)
-else:
-    # Create tank body (cylinder)
-    tank = doc.addObject("Part::Cylinder", "{struct_id}_tank")
-    tank.Radius = {radius_mm}
-    tank.Height = {tank_height_mm}
-    tank.Label = "{struct_id}_tank"
-
-    # Create dome cover using Part::Ellipsoid (flattened hemisphere)
-    # Radius1 = Z height, Radius2 = X radius, Radius3 = Y radius
-    dome = doc.addObject("Part::Ellipsoid", "{struct_id}_dome")
-    dome.Radius1 = {dome_height_mm}  # Z-direction (dome height)
-    dome.Radius2 = {radius_mm}       # X-direction (horizontal radius)
-    dome.Radius3 = {radius_mm}       # Y-direction (horizontal radius)
-    dome.Angle1 = 0                  # Start at equator
-    dome.Angle2 = 90                 # End at top (hemisphere)
-    dome.Angle3 = 360                # Full rotation
-    dome.Label = "{struct_id}_dome"
-
-    # Position dome on top of tank
-    dome.Placement.Base.z = {tank_height_mm}
-
-    # Create compound to group tank + dome
-    compound = doc.addObject("Part::Compound", "{struct_id}")
-    compound.Links = [tank, dome]
-    compound.Label = "{struct_id}"
-
-    # Add EquipmentId for stable lookup (on compound, not individual parts)
-    try:
-        compound.addProperty("App::PropertyString", "EquipmentId", "ProcessEng", "Stable equipment ID")
-    except Exception:
-        pass
-    compound.EquipmentId = "{struct_id}"
-
-    try:
-        compound.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
-    except Exception:
-        pass
-    compound.EquipmentType = "{struct_type}"
-
-    doc.recompute()
-    print("EQUIP_STATUS:created:{struct_id}:" + compound.Name)
-'''
-                        else:
-                            # Non-digester circular equipment: simple cylinder
-                            equip_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-
-# Check for existing equipment by EquipmentId property first, then by Name
-existing = None
-for obj in doc.Objects:
-    if getattr(obj, "EquipmentId", None) == "{struct_id}":
-        existing = obj
-        break
-if not existing:
-    existing = doc.getObject("{struct_id}")
-
-if existing:
-    print("EQUIP_STATUS:exists:{struct_id}:" + existing.Name)
-else:
-    cylinder = doc.addObject("Part::Cylinder", "{struct_id}")
-    # Accept the object regardless of auto-rename (FreeCAD adds suffix on collision)
-    actual_name = cylinder.Name
-    cylinder.Radius = {radius_mm}
-    cylinder.Height = {height_mm}
-    cylinder.Label = "{struct_id}"  # Display name
-
-    # Add EquipmentId for stable lookup (survives name collisions)
-    try:
-        cylinder.addProperty("App::PropertyString", "EquipmentId", "ProcessEng", "Stable equipment ID")
-    except Exception:
-        pass  # Property may already exist
-    cylinder.EquipmentId = "{struct_id}"
-
-    try:
-        cylinder.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
-    except Exception:
-        pass  # Property may already exist
-    cylinder.EquipmentType = "{struct_type}"
-    doc.recompute()
-
-    if actual_name != "{struct_id}":
-        print("EQUIP_STATUS:created_renamed:{struct_id}:" + actual_name)
-    else:
-        print("EQUIP_STATUS:created:{struct_id}:" + actual_name)
-'''
-                    else:  # rectangle
-                        orig_w = footprint.get("w", 10.0)
-                        orig_h = footprint.get("h", 10.0)
-
-                        # Look up placement to get rotation_deg for dimension swapping
-                        placement = next(
-                            (p for p in placements_data if p.get("id") == struct_id),
-                            None
-                        )
-                        rotation_deg = placement.get("rotation_deg", 0) if placement else 0
-
-                        # Pre-swap dimensions for 90/270 rotation (no FreeCAD rotation needed)
-                        width, length = get_rect_dims_at_rotation(orig_w, orig_h, rotation_deg)
-                        width_mm = width * M_TO_MM
-                        length_mm = length * M_TO_MM
-                        height_mm = struct_height * M_TO_MM
-
-                        equip_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-
-# Check for existing equipment by EquipmentId property first, then by Name
-existing = None
-for obj in doc.Objects:
-    if getattr(obj, "EquipmentId", None) == "{struct_id}":
-        existing = obj
-        break
-if not existing:
-    existing = doc.getObject("{struct_id}")
-
-if existing:
-    print("EQUIP_STATUS:exists:{struct_id}:" + existing.Name)
-else:
-    box = doc.addObject("Part::Box", "{struct_id}")
-    # Accept the object regardless of auto-rename (FreeCAD adds suffix on collision)
-    actual_name = box.Name
-    box.Width = {width_mm}   # Pre-swapped for rotation
-    box.Length = {length_mm}  # Pre-swapped for rotation
-    box.Height = {height_mm}
-    box.Label = "{struct_id}"  # Display name
-    # NOTE: Dimensions are pre-swapped based on rotation_deg, so no Placement.Rotation needed
-    # apply_placements handles center-to-corner conversion using swapped dimensions
-
-    # Add EquipmentId for stable lookup (survives name collisions)
-    try:
-        box.addProperty("App::PropertyString", "EquipmentId", "ProcessEng", "Stable equipment ID")
-    except Exception:
-        pass  # Property may already exist
-    box.EquipmentId = "{struct_id}"
-
-    try:
-        box.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
-    except Exception:
-        pass  # Property may already exist
-    box.EquipmentType = "{struct_type}"
-    doc.recompute()
-
-    if actual_name != "{struct_id}":
-        print("EQUIP_STATUS:created_renamed:{struct_id}:" + actual_name)
-    else:
-        print("EQUIP_STATUS:created:{struct_id}:" + actual_name)
-'''
-
-                    res = freecad.execute_code(equip_code)
-                    msg = res.get("message", "")
-                    if "EQUIP_STATUS:created" in msg or "EQUIP_STATUS:exists" in msg:
-                        results["equipment"] += 1
-                        # Log if object was auto-renamed
-                        if "created_renamed" in msg:
-                            logger.info("equipment_auto_renamed", struct_id=struct_id, reason="name_collision")
-                    else:
-                        error_detail = res.get("error", msg or "Unknown error")
-                        results["errors"].append(f"Failed to create {struct_id}: {error_detail}")
-                        logger.error("equipment_creation_failed", struct_id=struct_id, error=error_detail)
-
-                        # Fail fast in strict mode
-                        if strict:
-                            return [TextContent(
-                                type="text",
-                                text=f"Equipment creation failed (strict mode):\n"
-                                     f"  Failed: {struct_id}\n"
-                                     f"  Error: {error_detail}\n"
-                                     f"  Created: {results['equipment']} of {len(structures)}\n"
-                                     f"Use strict=False to continue on errors."
-                            )]
-
-            # 4. Apply placements if requested
-            if apply_placements_flag and placements_data:
-                placement_code = f'''
-import FreeCAD
-import math
-
-doc = FreeCAD.getDocument("{doc_name}")
-M_TO_MM = 1000.0
-placements = {json.dumps(placements_data)}
-updated = 0
-not_found = []
-
-def find_equipment_by_id(doc, equip_id):
-    """Find equipment by EquipmentId property (survives name collisions)."""
-    # First, try to find by EquipmentId custom property
-    for obj in doc.Objects:
-        if getattr(obj, "EquipmentId", None) == equip_id:
-            return obj
-    # Fallback to normalized Name (FreeCAD converts hyphens to underscores)
-    normalized_id = equip_id.replace("-", "_")
-    obj = doc.getObject(normalized_id)
-    if obj:
-        return obj
-    # Fallback to Label search
-    matches = doc.getObjectsByLabel(equip_id)
-    if len(matches) == 1:
-        return matches[0]
-    return None
-
-for p in placements:
-    # Support both 'id' (contract format) and 'structure_id' (site-fit format)
-    obj_id = p.get("id") or p.get("structure_id")
-    if not obj_id:
-        not_found.append("missing_id")
-        continue
-
-    x = p.get("x", 0) * M_TO_MM
-    y = p.get("y", 0) * M_TO_MM
-    rotation_deg = p.get("rotation_deg", 0)
-
-    obj = find_equipment_by_id(doc, obj_id)
-    if not obj:
-        not_found.append(obj_id)
-        continue
-
-    current_z = obj.Placement.Base.z
-
-    # Create rotation around Z axis
-    rotation = FreeCAD.Rotation(FreeCAD.Vector(0, 0, 1), rotation_deg)
-
-    # For Part::Box (rectangular equipment), calculate corner position
-    # Site-fit provides CENTER coordinates, but FreeCAD Part::Box uses CORNER as origin
-    # FreeCAD Placement rotation happens around Placement.Base (the corner), not geometric center
-    # Formula: Base = center_world - R * center_local
-    if obj.TypeId == "Part::Box":
-        # FreeCAD Part::Box dimensions: Width=X, Length=Y, Height=Z
-        half_x = obj.Width.Value / 2.0
-        half_y = obj.Length.Value / 2.0
-        center_local = FreeCAD.Vector(half_x, half_y, 0)
-
-        # Compute base so that center ends up at (x, y) after rotation
-        center_world = FreeCAD.Vector(x, y, current_z)
-        new_pos = center_world - rotation.multVec(center_local)
-    else:
-        # Cylinders and other shapes are already centered
-        new_pos = FreeCAD.Vector(x, y, current_z)
-
-    obj.Placement = FreeCAD.Placement(new_pos, rotation)
-    updated += 1
-
-doc.recompute()
-if not_found:
-    print(f"placements_{{updated}}_missing_" + ",".join(not_found))
-else:
-    print(f"placements_{{updated}}")
-'''
-                res = freecad.execute_code(placement_code)
-                msg = res.get("message", "")
-                if "placements_" in msg:
-                    try:
-                        parts = msg.split("placements_")[1]
-                        count = int(parts.split("_")[0].split()[0])
-                        results["placements"] = count
-
-                        # Check for missing equipment
-                        if "_missing_" in msg:
-                            missing = msg.split("_missing_")[1].strip()
-                            if missing:
-                                results["errors"].append(f"Placements skipped for missing equipment: {missing}")
-                                if strict:
-                                    logger.warning("strict_mode_missing_equipment", count=len(missing.split(',')), missing=missing)
-                    except (ValueError, IndexError):
-                        pass
-
-            # 5. Create road geometry with visual hierarchy (Phase 4B)
-            # - Centerline (dashed gray) for civil alignment
-            # - Edge of pavement (solid black) if available
-            if create_roads and road_network and road_network.get("segments"):
-                segments = road_network["segments"]
-
-                # Create a group for roads
-                group_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-group = doc.addObject("App::DocumentObjectGroup", "{road_layer_name}")
-group.Label = "{road_layer_name}"
-doc.recompute()
-print("group_ok")
-'''
-                freecad.execute_code(group_code)
-
-                for seg in segments:
-                    seg_id = seg.get("id", "road")
-
-                    # Get centerline from either centerline array or start/end/waypoints
-                    centerline = seg.get("centerline")
-                    if centerline:
-                        all_points = centerline
-                    else:
-                        start = seg.get("start") or [0, 0]
-                        end = seg.get("end") or [0, 0]
-                        waypoints = seg.get("waypoints") or []
-                        all_points = [start] + waypoints + [end]
-
-                    points_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in all_points]
-
-                    # 1. Centerline (dashed gray for civil alignment)
-                    road_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-points = {json.dumps(points_mm)}
-vectors = [FreeCAD.Vector(p[0], p[1], 0) for p in points]
-wire = Draft.makeWire(vectors, closed=False, face=False)
-wire.Label = "{seg_id}_CL"
-if hasattr(wire.ViewObject, "LineColor"):
-    wire.ViewObject.LineColor = (0.5, 0.5, 0.5)  # Gray
-if hasattr(wire.ViewObject, "LineWidth"):
-    wire.ViewObject.LineWidth = 1.5
-if hasattr(wire.ViewObject, "DrawStyle"):
-    wire.ViewObject.DrawStyle = "Dashed"
-
-# Add to group
-group = doc.getObject("{road_layer_name}")
-if group:
-    group.addObject(wire)
-
-doc.recompute()
-print("road_ok")
-'''
-                    res = freecad.execute_code(road_code)
-                    if "road_ok" in res.get("message", ""):
-                        results["roads"] += 1
-
-                    # 2. Edge of pavement (solid black) if available
-                    edge_left = seg.get("edge_left")
-                    edge_right = seg.get("edge_right")
-
-                    if edge_left and len(edge_left) >= 2:
-                        left_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in edge_left]
-                        edge_left_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-points = {json.dumps(left_mm)}
-vectors = [FreeCAD.Vector(p[0], p[1], 0) for p in points]
-wire = Draft.makeWire(vectors, closed=False, face=False)
-wire.Label = "{seg_id}_EL"
-if hasattr(wire.ViewObject, "LineColor"):
-    wire.ViewObject.LineColor = (0.0, 0.0, 0.0)  # Black
-if hasattr(wire.ViewObject, "LineWidth"):
-    wire.ViewObject.LineWidth = 1.0
-
-group = doc.getObject("{road_layer_name}")
-if group:
-    group.addObject(wire)
-
-doc.recompute()
-print("edge_ok")
-'''
-                        freecad.execute_code(edge_left_code)
-
-                    if edge_right and len(edge_right) >= 2:
-                        right_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in edge_right]
-                        edge_right_code = f'''
-import FreeCAD
-import Draft
+                        spec["radius_mm"] = (diameter / 2) * M_TO_MM
 
-doc = FreeCAD.getDocument("{doc_name}")
-points = {json.dumps(right_mm)}
-vectors = [FreeCAD.Vector(p[0], p[1], 0) for p in points]
-wire = Draft.makeWire(vectors, closed=False, face=False)
-wire.Label = "{seg_id}_ER"
-if hasattr(wire.ViewObject, "LineColor"):
-    wire.ViewObject.LineColor = (0.0, 0.0, 0.0)  # Black
-if hasattr(wire.ViewObject, "LineWidth"):
-    wire.ViewObject.LineWidth = 1.0
+                        # Digester types get a dome cover; height is the shell height,
+                        # dome added on top
+                        if struct_type.casefold() in SITEFIT_DOME_COVER_TYPES:
+                            spec["kind"] = "dome"
+                            # Determine dome height: prefer explicit, fallback to ratio
+                            if dome_height_m is not None:
+                                spec["dome_height_mm"] = dome_height_m * M_TO_MM
+                            else:
+                                spec["dome_height_mm"] = diameter * DOME_RATIO * M_TO_MM
+                        else:
+                            spec["kind"] = "cylinder"
+                    else:  # rectangle
+                        orig_w = footprint.get("w", 10.0)
+                        orig_h = footprint.get("h", 10.0)
 
-group = doc.getObject("{road_layer_name}")
-if group:
-    group.addObject(wire)
+                        # Look up placement to get rotation_deg for dimension swapping
+                        placement = placement_by_id.get(struct_id)
+                        rotation_deg = placement.get("rotation_deg", 0) if placement else 0
 
-doc.recompute()
-print("edge_ok")
-'''
-                        freecad.execute_code(edge_right_code)
+                        # Pre-swap dimensions for 90/270 rotation (no FreeCAD rotation needed)
+                        width, length = get_rect_dims_at_rotation(orig_w, orig_h, rotation_deg)
+                        spec["kind"] = "box"
+                        spec["width_mm"] = width * M_TO_MM
+                        spec["length_mm"] = length * M_TO_MM
 
-            # Final view adjustment
-            view_code = f'''
-import FreeCAD
-import FreeCADGui
+                    equipment_specs.append(spec)
 
-doc = FreeCAD.getDocument("{doc_name}")
-doc.recompute()
-FreeCADGui.ActiveDocument.ActiveView.viewTop()
-FreeCADGui.ActiveDocument.ActiveView.fitAll()
-print("view_ok")
-'''
-            freecad.execute_code(view_code)
+            # Road geometry with visual hierarchy (Phase 4B)
+            # - Centerline (dashed gray) for civil alignment
+            # - Edge of pavement (solid black) if available
+            road_wires = []
+            if create_roads and road_network and road_network.get("segments"):
+                for seg in road_network["segments"]:
+                    seg_id = seg.get("id", "road")
+
+                    road_wires.append({"label": f"{seg_id}_CL", "style": "centerline",
+                                       "points": _segment_centerline(seg)})
+                    for side, suffix in (("edge_left", "EL"), ("edge_right", "ER")):
+                        edge = seg.get(side)
+                        if edge and len(edge) >= 2:
+                            road_wires.append({"label": f"{seg_id}_{suffix}", "style": "edge", "points": edge})
+
+                # Convert every road point list to mm in one pass
+                scaled = scale_point_lists([wire["points"] for wire in road_wires], M_TO_MM, z=0.0, ndigits=MM_DECIMALS)
+                for wire, points_mm in zip(road_wires, scaled):
+                    wire["points"] = points_mm
+
+            build_placements = placements_data if apply_placements_flag else []
+            if equipment_specs or build_placements or road_wires:
+                res = freecad.execute_code(_SITEFIT_BUILD_SRC, {
+                    "doc_name": doc_name,
+                    "strict": strict,
+                    "equipment": equipment_specs,
+                    "placements": build_placements,
+                    "road_wires": road_wires,
+                    "road_layer_name": road_layer_name,
+                    "parametric_wires": parametric_wires,
+                    "boundary_created": bool(results["boundary"]),
+                })
+                msg = res.get("message", "")
+                try:
+                    report = _script_result(res) if res.get("success") else None
+                except json.JSONDecodeError:
+                    report = None
+                if report is None:
+                    error_detail = res.get("error", msg or "Unknown error")
+                    results["errors"].append(f"Failed to build site geometry: {error_detail}")
+                    logger.error("sitefit_build_failed", error=error_detail)
+                    report = {"equipment": [], "stopped": False, "placements": 0,
+                              "missing": [], "roads": 0, "errors": []}
+                    # The script never reached its own recompute; bring the
+                    # boundary and anything built before the failure up to date
+                    freecad.execute_code(_FIT_VIEW_SRC, {"doc_name": doc_name})
+
+                for item in report["equipment"]:
+                    if item["status"] == "error":
+                        results["errors"].append(f"Failed to create {item['id']}: {item['error']}")
+                        logger.error("equipment_creation_failed", struct_id=item["id"], error=item["error"])
+                    else:
+                        results["equipment"] += 1
+                        # Log if object was auto-renamed
+                        if item["status"] == "created_renamed":
+                            logger.info("equipment_auto_renamed", struct_id=item["id"], reason="name_collision")
+
+                # Fail fast in strict mode
+                if report["stopped"]:
+                    failed = report["equipment"][-1]
+                    return [TextContent(
+                        type="text",
+                        text=f"Equipment creation failed (strict mode):\n"
+                             f"  Failed: {failed['id']}\n"
+                             f"  Error: {failed['error']}\n"
+                             f"  Created: {results['equipment']} of {len(structures)}\n"
+                             f"Use strict=False to continue on errors."
+                    )]
+
+                results["placements"] = report["placements"]
+                if report["missing"]:
+                    missing = ",".join(report["missing"])
+                    results["errors"].append(f"Placements skipped for missing equipment: {missing}")
+                    if strict:
+                        logger.warning("strict_mode_missing_equipment", count=len(report["missing"]), missing=missing)
+
+                results["roads"] = report["roads"]
+                results["errors"].extend(report["errors"])
+
+            elif results["boundary"]:
+                # Boundary only: frame it without a build round trip
+                freecad.execute_code(_FIT_VIEW_SRC, {"doc_name": doc_name})
 
             # Build summary
             summary_parts = [f"Imported site-fit contract into '{doc_name}':"]
@@ -1919,10 +2407,9 @@ print("view_ok")
                 summary_parts.append(f"  - Road segments: {results['roads']}")
             if results["errors"]:
                 summary_parts.append(f"  - Errors: {len(results['errors'])}")
-                for err in results["errors"][:3]:
-                    summary_parts.append(f"    - {err}")
+                summary_parts.extend(f"    - {err}" for err in results["errors"][:3])
 
-            screenshot = freecad.get_active_screenshot()
+            screenshot = freecad.get_active_screenshot() if include_screenshot else None
             response = [TextContent(type="text", text="\n".join(summary_parts))]
             return add_screenshot_if_available(response, screenshot, include_screenshot)
 
@@ -1940,6 +2427,7 @@ print("view_ok")
         keepouts: list[dict] | None = None,
         active_layer_index: int = 0,
         create_roads: bool = True,
+        parametric_wires: bool = False,
         include_screenshot: bool = False,
         detail_level: DetailLevel = "compact",
         ctx: Context = None,
@@ -1962,6 +2450,8 @@ print("view_ok")
             keepouts: Optional keepout zones
             active_layer_index: Which solution layer is visible by default (0-indexed)
             create_roads: Whether to create road centerlines per layer (default: True)
+            parametric_wires: Draw roads as editable Draft Wires instead of plain Part
+                polylines (default: False, faster for large road networks)
 
         Returns:
             Summary with layer names and visibility toggle instructions
@@ -1979,77 +2469,37 @@ print("view_ok")
                 create_roads=True
             )
         """
+        if site_boundary:
+            try:
+                validate_points(site_boundary, "site_boundary", min_points=3)
+            except ValueError as e:
+                return [TextContent(type="text", text=f"Invalid boundary: {e}")]
+
         freecad = get_freecad_connection()
 
         try:
-            # 1. Create or get document
-            doc_code = f'''
-import FreeCAD
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    doc = FreeCAD.newDocument("{doc_name}")
-    print("DOC_STATUS:created")
-else:
-    print("DOC_STATUS:exists")
-'''
-            freecad.execute_code(doc_code)
-
-            # 2. Create Common layer with boundary
-            common_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-
-# Create Common group for shared elements
-common_group = doc.addObject("App::DocumentObjectGroup", "Common")
-common_group.Label = "Common"
-'''
-            if site_boundary:
-                points_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in site_boundary]
-                common_code += f'''
-# Create site boundary
-points = [FreeCAD.Vector(p[0], p[1], 0) for p in {points_mm}]
-wire = Draft.make_wire(points, closed=True, face=False)
-wire.Label = "SiteBoundary"
-common_group.addObject(wire)
-'''
-            common_code += '''
-doc.recompute()
-print("common_ok")
-'''
-            freecad.execute_code(common_code)
+            # 1. Create or get the document and its Common group with the boundary
+            freecad.execute_code(_LAYERS_COMMON_SRC, {
+                "doc_name": doc_name,
+                "boundary_mm": scale_points(site_boundary, M_TO_MM, z=0.0, ndigits=MM_DECIMALS) if site_boundary else None,
+            })
 
-            # 3. Create a layer for each solution
+            # 2. Create a layer for each solution
             created_layers = []
             for idx, sol in enumerate(solutions):
                 sol_id = sol.get("solution_id", f"sol_{idx}")
                 rank = sol.get("rank", idx + 1)
                 placements = sol.get("placements", [])
+                placement_by_id = _index_placements(placements)
                 structures = sol.get("structures", [])
                 layer_name = f"Layout_{idx + 1}_Rank{rank}"
                 is_active = (idx == active_layer_index)
 
-                # Create layer group
-                layer_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-
-# Create layer group
-layer = doc.addObject("App::DocumentObjectGroup", "{layer_name}")
-layer.Label = "{layer_name}"
-
-# Create equipment subgroup
-equip_group = doc.addObject("App::DocumentObjectGroup", "{layer_name}_Equipment")
-equip_group.Label = "Equipment"
-layer.addObject(equip_group)
-
-doc.recompute()
-print("layer_ok")
-'''
-                freecad.execute_code(layer_code)
+                # Every script for this layer goes out as one batch; centerline
+                # script positions are kept to count successful roads
+                layer_params = {"doc_name": doc_name, "layer_name": layer_name}
+                scripts = [(_LAYER_GROUP_SRC, layer_params)]
+                centerline_indexes = []
 
                 # Create equipment for this layer
                 for struct in structures:
@@ -2061,10 +2511,7 @@ print("layer_ok")
                     height_mm = struct_height * M_TO_MM
 
                     # Find placement for this structure
-                    placement = next(
-                        (p for p in placements if p.get("structure_id") == struct_id or p.get("id") == struct_id),
-                        None
-                    )
+                    placement = placement_by_id.get(struct_id)
                     x_m = placement.get("x", 0) if placement else 0
                     y_m = placement.get("y", 0) if placement else 0
                     rotation_deg = placement.get("rotation_deg", 0) if placement else 0
@@ -2076,214 +2523,117 @@ print("layer_ok")
 
                     if shape == "circle":
                         diameter = footprint.get("d", 10.0)
-                        radius_mm = (diameter / 2) * M_TO_MM
-                        equip_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-layer = doc.getObject("{layer_name}")
-equip_group = doc.getObject("{layer_name}_Equipment")
-
-cyl = doc.addObject("Part::Cylinder", "{obj_name}")
-cyl.Radius = {radius_mm}
-cyl.Height = {height_mm}
-cyl.Label = "{struct_id}"
-cyl.Placement = FreeCAD.Placement(FreeCAD.Vector({x_mm}, {y_mm}, 0), FreeCAD.Rotation())
-equip_group.addObject(cyl)
-doc.recompute()
-'''
+                        equip_params = {
+                            "kind": "cylinder",
+                            "radius_mm": (diameter / 2) * M_TO_MM,
+                            "base_mm": [x_mm, y_mm, 0],
+                        }
                     else:  # rectangle
                         orig_w = footprint.get("w", 10.0)
                         orig_h = footprint.get("h", 10.0)
 
                         # Pre-swap dimensions for 90/270 rotation
-                        if rotation_deg in (90, 270):
-                            width, length = orig_h, orig_w
-                        else:
-                            width, length = orig_w, orig_h
-
+                        width, length = get_rect_dims_at_rotation(orig_w, orig_h, rotation_deg)
                         width_mm = width * M_TO_MM
                         length_mm = length * M_TO_MM
-                        half_x = width_mm / 2.0
-                        half_y = length_mm / 2.0
-                        corner_x = x_mm - half_x
-                        corner_y = y_mm - half_y
-
-                        equip_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-layer = doc.getObject("{layer_name}")
-equip_group = doc.getObject("{layer_name}_Equipment")
-
-box = doc.addObject("Part::Box", "{obj_name}")
-box.Width = {width_mm}
-box.Length = {length_mm}
-box.Height = {height_mm}
-box.Label = "{struct_id}"
-box.Placement = FreeCAD.Placement(FreeCAD.Vector({corner_x}, {corner_y}, 0), FreeCAD.Rotation())
-equip_group.addObject(box)
-doc.recompute()
-'''
-                    freecad.execute_code(equip_code)
+                        corner_x, corner_y = center_to_corner(x_mm, y_mm, width_mm, length_mm)
+                        equip_params = {
+                            "kind": "box",
+                            "width_mm": width_mm,
+                            "length_mm": length_mm,
+                            "base_mm": [corner_x, corner_y, 0],
+                        }
+                    scripts.append((_LAYER_EQUIPMENT_SRC, {
+                        **layer_params,
+                        **equip_params,
+                        "obj_name": obj_name,
+                        "label": struct_id,
+                        "height_mm": height_mm,
+                    }))
 
                 # Create roads for this layer if requested and road_network exists
-                road_count = 0
                 road_network = sol.get("road_network")
                 if create_roads and road_network and road_network.get("segments"):
                     segments = road_network["segments"]
 
                     # Create roads subgroup
                     roads_group_name = f"{layer_name}_Roads"
-                    roads_group_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-layer = doc.getObject("{layer_name}")
-
-# Create roads subgroup
-roads_group = doc.addObject("App::DocumentObjectGroup", "{roads_group_name}")
-roads_group.Label = "Roads"
-layer.addObject(roads_group)
-doc.recompute()
-print("roads_group_ok")
-'''
-                    freecad.execute_code(roads_group_code)
+                    scripts.append((_LAYER_ROADS_GROUP_SRC, {**layer_params, "roads_group_name": roads_group_name}))
+
+                    # Convert every centerline, then every left/right edge, of
+                    # this layer to mm in one pass
+                    n_segments = len(segments)
+                    scaled = scale_point_lists(
+                        [_segment_centerline(seg) for seg in segments]
+                        + [seg.get(side) or [] for seg in segments for side in ("edge_left", "edge_right")],
+                        M_TO_MM,
+                        z=0.0,
+                        ndigits=MM_DECIMALS,
+                    )
 
                     # Create each road segment with visual hierarchy:
                     # - Centerline (dashed gray) for alignment
                     # - Edge of pavement (solid black) if available
-                    for seg in segments:
-                        seg_id = seg.get("id", f"road_{road_count}")
-
-                        # Get centerline from either centerline array or start/end/waypoints
-                        centerline = seg.get("centerline")
-                        if centerline:
-                            all_points = centerline
-                        else:
-                            start = seg.get("start") or [0, 0]
-                            end = seg.get("end") or [0, 0]
-                            waypoints = seg.get("waypoints") or []
-                            all_points = [start] + waypoints + [end]
-
-                        points_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in all_points]
+                    for seg_idx, seg in enumerate(segments):
+                        seg_id = seg.get("id", f"road_{len(centerline_indexes)}")
+                        points_mm = scaled[seg_idx]
 
                         # Style based on active/inactive layer (Phase 1B)
                         # Active: solid centerline, black edges
                         # Inactive: dashed centerline, lighter edges
                         cl_draw_style = "Solid" if is_active else "Dashed"
                         cl_line_width = 2.0 if is_active else 1.5
-                        cl_color = "(0.3, 0.3, 0.3)" if is_active else "(0.6, 0.6, 0.6)"  # Darker for active
+                        cl_color = [0.3, 0.3, 0.3] if is_active else [0.6, 0.6, 0.6]  # Darker for active
+                        wire_params = {
+                            "doc_name": doc_name,
+                            "roads_group_name": roads_group_name,
+                            "parametric_wires": parametric_wires,
+                        }
 
                         # 1. Centerline (style varies by active state)
-                        centerline_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-points = {json.dumps(points_mm)}
-vectors = [FreeCAD.Vector(p[0], p[1], 0) for p in points]
-wire = Draft.makeWire(vectors, closed=False, face=False)
-wire.Label = "{seg_id}_CL"
-
-# Style: active=solid darker, inactive=dashed lighter
-if hasattr(wire.ViewObject, "LineColor"):
-    wire.ViewObject.LineColor = {cl_color}
-if hasattr(wire.ViewObject, "LineWidth"):
-    wire.ViewObject.LineWidth = {cl_line_width}
-if hasattr(wire.ViewObject, "DrawStyle"):
-    wire.ViewObject.DrawStyle = "{cl_draw_style}"
-
-# Add to roads group
-roads_group = doc.getObject("{roads_group_name}")
-if roads_group:
-    roads_group.addObject(wire)
-
-doc.recompute()
-print("centerline_ok")
-'''
-                        res = freecad.execute_code(centerline_code)
-                        if "centerline_ok" in res.get("message", ""):
-                            road_count += 1
+                        centerline_indexes.append(len(scripts))
+                        scripts.append((_LAYER_ROAD_WIRE_SRC, {
+                            **wire_params,
+                            "points_mm": points_mm,
+                            "label": f"{seg_id}_CL",
+                            "line_color": cl_color,
+                            "line_width": cl_line_width,
+                            "draw_style": cl_draw_style,
+                        }))
 
                         # 2. Edge of pavement (style varies by active state)
                         edge_left = seg.get("edge_left")
                         edge_right = seg.get("edge_right")
-                        edge_color = "(0.0, 0.0, 0.0)" if is_active else "(0.5, 0.5, 0.5)"  # Black for active, gray for inactive
+                        edge_color = [0.0, 0.0, 0.0] if is_active else [0.5, 0.5, 0.5]  # Black for active, gray for inactive
                         edge_width = 1.5 if is_active else 1.0
 
                         if edge_left and len(edge_left) >= 2:
-                            left_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in edge_left]
-                            edge_left_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-points = {json.dumps(left_mm)}
-vectors = [FreeCAD.Vector(p[0], p[1], 0) for p in points]
-wire = Draft.makeWire(vectors, closed=False, face=False)
-wire.Label = "{seg_id}_EL"
-
-# Style: active=solid black, inactive=lighter gray
-if hasattr(wire.ViewObject, "LineColor"):
-    wire.ViewObject.LineColor = {edge_color}
-if hasattr(wire.ViewObject, "LineWidth"):
-    wire.ViewObject.LineWidth = {edge_width}
-if hasattr(wire.ViewObject, "DrawStyle"):
-    wire.ViewObject.DrawStyle = "Solid"
-
-roads_group = doc.getObject("{roads_group_name}")
-if roads_group:
-    roads_group.addObject(wire)
-
-doc.recompute()
-print("edge_ok")
-'''
-                            freecad.execute_code(edge_left_code)
+                            scripts.append((_LAYER_ROAD_WIRE_SRC, {
+                                **wire_params,
+                                "points_mm": scaled[n_segments + 2 * seg_idx],
+                                "label": f"{seg_id}_EL",
+                                "line_color": edge_color,
+                                "line_width": edge_width,
+                                "draw_style": "Solid",
+                            }))
 
                         if edge_right and len(edge_right) >= 2:
-                            right_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in edge_right]
-                            edge_right_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-points = {json.dumps(right_mm)}
-vectors = [FreeCAD.Vector(p[0], p[1], 0) for p in points]
-wire = Draft.makeWire(vectors, closed=False, face=False)
-wire.Label = "{seg_id}_ER"
-
-# Style: active=solid black, inactive=lighter gray
-if hasattr(wire.ViewObject, "LineColor"):
-    wire.ViewObject.LineColor = {edge_color}
-if hasattr(wire.ViewObject, "LineWidth"):
-    wire.ViewObject.LineWidth = 1.0
-if hasattr(wire.ViewObject, "DrawStyle"):
-    wire.ViewObject.DrawStyle = "Solid"
-
-roads_group = doc.getObject("{roads_group_name}")
-if roads_group:
-    roads_group.addObject(wire)
-
-doc.recompute()
-print("edge_ok")
-'''
-                            freecad.execute_code(edge_right_code)
+                            scripts.append((_LAYER_ROAD_WIRE_SRC, {
+                                **wire_params,
+                                "points_mm": scaled[n_segments + 2 * seg_idx + 1],
+                                "label": f"{seg_id}_ER",
+                                "line_color": edge_color,
+                                "line_width": 1.0,
+                                "draw_style": "Solid",
+                            }))
 
                 # Set layer visibility
-                visibility_code = f'''
-import FreeCAD
+                scripts.append((_LAYER_VISIBILITY_SRC, {**layer_params, "visible": is_active}))
 
-doc = FreeCAD.getDocument("{doc_name}")
-layer = doc.getObject("{layer_name}")
-if hasattr(layer, "ViewObject") and layer.ViewObject:
-    layer.ViewObject.Visibility = {is_active}
-doc.recompute()
-'''
-                freecad.execute_code(visibility_code)
+                results = freecad.execute_batch(scripts)
+                road_count = sum(
+                    1 for i in centerline_indexes if "road_wire_ok" in results[i].get("message", "")
+                )
 
                 created_layers.append({
                     "layer_name": layer_name,
@@ -2295,16 +2645,7 @@ doc.recompute()
                 })
 
             # Set view
-            view_code = f'''
-import FreeCAD
-import FreeCADGui
-
-doc = FreeCAD.getDocument("{doc_name}")
-doc.recompute()
-FreeCADGui.ActiveDocument.ActiveView.viewTop()
-FreeCADGui.ActiveDocument.ActiveView.fitAll()
-'''
-            freecad.execute_code(view_code)
+            freecad.execute_code(_FIT_VIEW_SRC, {"doc_name": doc_name})
 
             # Build summary
             summary = [f"Created {len(created_layers)} solution layers in '{doc_name}':"]
@@ -2315,7 +2656,7 @@ FreeCADGui.ActiveDocument.ActiveView.fitAll()
 
             summary.append("\nUse set_layout_visibility() to toggle between solutions.")
 
-            screenshot = freecad.get_active_screenshot()
+            screenshot = freecad.get_active_screenshot() if include_screenshot else None
             response = [TextContent(type="text", text="\n".join(summary))]
             return add_screenshot_if_available(response, screenshot, include_screenshot)
 
@@ -2351,42 +2692,11 @@ FreeCADGui.ActiveDocument.ActiveView.fitAll()
         freecad = get_freecad_connection()
 
         try:
-            toggle_code = f'''
-import FreeCAD
-
-doc = FreeCAD.getDocument("{doc_name}")
-if not doc:
-    raise ValueError("Document '{doc_name}' not found")
-
-# Get all layer groups (exclude "Common")
-layer_groups = [obj for obj in doc.Objects
-                if obj.TypeId == "App::DocumentObjectGroup"
-                and obj.Name.startswith("Layout_")]
-
-visible_layer = "{visible_layer or ''}"
-show_all = {show_all}
-
-updated = []
-for layer in layer_groups:
-    if layer.ViewObject:
-        if show_all:
-            layer.ViewObject.Visibility = True
-            updated.append(f"{{layer.Name}}: visible")
-        elif visible_layer and layer.Name == visible_layer:
-            layer.ViewObject.Visibility = True
-            updated.append(f"{{layer.Name}}: visible")
-        elif visible_layer:
-            layer.ViewObject.Visibility = False
-            updated.append(f"{{layer.Name}}: hidden")
-        else:
-            # No specific layer, hide all
-            layer.ViewObject.Visibility = False
-            updated.append(f"{{layer.Name}}: hidden")
-
-doc.recompute()
-print(__import__("json").dumps({{"layers": updated}}))
-'''
-            res = freecad.execute_code(toggle_code)
+            res = freecad.execute_code(_TOGGLE_LAYERS_SRC, {
+                "doc_name": doc_name,
+                "visible_layer": visible_layer or "",
+                "show_all": show_all,
+            })
 
             if show_all:
                 summary = f"All solution layers in '{doc_name}' are now visible for comparison."
@@ -2395,7 +2705,7 @@ print(__import__("json").dumps({{"layers": updated}}))
             else:
                 summary = f"All solution layers in '{doc_name}' are now hidden. Only Common layer visible."
 
-            screenshot = freecad.get_active_screenshot()
+            screenshot = freecad.get_active_screenshot() if include_screenshot else None
             response = [TextContent(type="text", text=summary)]
             return add_screenshot_if_available(response, screenshot, include_screenshot)
 
@@ -2462,53 +2772,37 @@ print(__import__("json").dumps({{"layers": updated}}))
             )
 
         # Legacy multi-document behavior
+        if site_boundary:
+            try:
+                validate_points(site_boundary, "site_boundary", min_points=3)
+            except ValueError as e:
+                return [TextContent(type="text", text=f"Invalid boundary: {e}")]
+
         freecad = get_freecad_connection()
         if not freecad.check_connection():
             return [TextContent(type="text", text="FreeCAD connection not available")]
 
-        created_docs = []
+        # The boundary is identical in every option document: convert it once
+        # instead of per document
+        boundary_mm = scale_points(site_boundary, M_TO_MM, z=0.0, ndigits=MM_DECIMALS) if site_boundary else None
 
-        for i, sol in enumerate(solutions):
+        def build_option_doc(i: int, sol: dict) -> dict:
             sol_id = sol.get("solution_id", f"unknown_{i}")
             rank = sol.get("rank", i + 1)
             metrics = sol.get("metrics", {})
             placements = sol.get("placements", [])
+            placement_by_id = _index_placements(placements)
             structures = sol.get("structures", [])
 
             doc_name = f"{doc_prefix}_Option{i+1}_Rank{rank}"
 
-            # Create document
-            create_doc_code = f'''
-import FreeCAD
-
-# Create new document
-doc = FreeCAD.newDocument("{doc_name}")
-FreeCAD.setActiveDocument("{doc_name}")
-print("doc_created")
-'''
-            res = freecad.execute_code(create_doc_code)
-            if "doc_created" not in res.get("message", ""):
-                created_docs.append({
-                    "doc_name": doc_name,
-                    "error": "Failed to create document"
-                })
-                continue
+            # Create document; all scripts for this option document go out
+            # as one batch
+            scripts = [(_OPTION_DOC_SRC, {"doc_name": doc_name})]
 
             # Add site boundary if provided
-            if site_boundary:
-                points_mm = [[p[0] * M_TO_MM, p[1] * M_TO_MM] for p in site_boundary]
-                boundary_code = f'''
-import FreeCAD
-import Draft
-
-doc = FreeCAD.getDocument("{doc_name}")
-points = [FreeCAD.Vector(p[0], p[1], 0) for p in {points_mm}]
-wire = Draft.make_wire(points, closed=True, face=False)
-wire.Label = "SiteBoundary"
-doc.recompute()
-print("boundary_ok")
-'''
-                freecad.execute_code(boundary_code)
+            if boundary_mm:
+                scripts.append((_OPTION_BOUNDARY_SRC, {"doc_name": doc_name, "points_mm": boundary_mm}))
 
             # Create equipment envelopes and apply placements
             for struct in structures:
@@ -2520,100 +2814,79 @@ print("boundary_ok")
                 height_mm = height * M_TO_MM
 
                 # Find placement for this structure (support both id formats)
-                placement = next(
-                    (p for p in placements if p.get("structure_id") == struct_id or p.get("id") == struct_id),
-                    None
-                )
+                placement = placement_by_id.get(struct_id)
                 x_m = placement.get("x", 0) if placement else 0
                 y_m = placement.get("y", 0) if placement else 0
                 rotation_deg = placement.get("rotation_deg", 0) if placement else 0
                 x_mm = x_m * M_TO_MM
                 y_mm = y_m * M_TO_MM
 
+                spec = {"id": struct_id, "type": struct_type, "height_mm": height_mm}
                 if shape == "circle":
                     diameter = footprint.get("d", 10.0)
-                    radius_mm = (diameter / 2) * M_TO_MM
-                    equip_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-cyl = doc.addObject("Part::Cylinder", "{struct_id}")
-cyl.Radius = {radius_mm}
-cyl.Height = {height_mm}
-cyl.Label = "{struct_id}"
-# Apply position and rotation
-rotation = FreeCAD.Rotation(FreeCAD.Vector(0, 0, 1), {rotation_deg})
-cyl.Placement = FreeCAD.Placement(FreeCAD.Vector({x_mm}, {y_mm}, 0), rotation)
-cyl.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
-cyl.EquipmentType = "{struct_type}"
-cyl.addProperty("App::PropertyString", "EquipmentId", "ProcessEng", "Stable equipment ID")
-cyl.EquipmentId = "{struct_id}"
-doc.recompute()
-print("equip_ok")
-'''
+                    spec["kind"] = "cylinder"
+                    spec["radius_mm"] = (diameter / 2) * M_TO_MM
+                    # Cylinder is centered: position at the center and apply rotation
+                    base_mm = [x_mm, y_mm, 0]
+                    envelope_rotation = rotation_deg
                 else:  # rectangle
                     orig_w = footprint.get("w", 10.0)   # Contract w = X dimension at 0°
                     orig_h = footprint.get("h", 10.0)   # Contract h = Y dimension at 0°
 
                     # Pre-swap dimensions for 90/270 rotation (no FreeCAD rotation needed)
-                    if rotation_deg in (90, 270):
-                        width, length = orig_h, orig_w
-                    else:
-                        width, length = orig_w, orig_h
-
-                    width_mm = width * M_TO_MM
-                    length_mm = length * M_TO_MM
+                    width, length = get_rect_dims_at_rotation(orig_w, orig_h, rotation_deg)
+                    spec["kind"] = "box"
+                    spec["width_mm"] = width * M_TO_MM
+                    spec["length_mm"] = length * M_TO_MM
                     # FreeCAD Part::Box: Width=X, Length=Y, Height=Z
                     # Dimensions are pre-swapped, so simple center-to-corner offset
-                    half_x_mm = width_mm / 2.0
-                    half_y_mm = length_mm / 2.0
-                    corner_x = x_mm - half_x_mm
-                    corner_y = y_mm - half_y_mm
-
-                    equip_code = f'''
-import FreeCAD
-import Part
-
-doc = FreeCAD.getDocument("{doc_name}")
-box = doc.addObject("Part::Box", "{struct_id}")
-box.Width = {width_mm}   # Pre-swapped X dimension
-box.Length = {length_mm}  # Pre-swapped Y dimension
-box.Height = {height_mm}
-box.Label = "{struct_id}"
+                    corner_x, corner_y = center_to_corner(x_mm, y_mm, spec["width_mm"], spec["length_mm"])
+                    base_mm = [corner_x, corner_y, 0]
+                    envelope_rotation = 0
 
-# Simple corner placement (dimensions pre-swapped, no rotation needed)
-box.Placement = FreeCAD.Placement(FreeCAD.Vector({corner_x}, {corner_y}, 0), FreeCAD.Rotation())
-
-box.addProperty("App::PropertyString", "EquipmentType", "ProcessEng", "Equipment type")
-box.EquipmentType = "{struct_type}"
-box.addProperty("App::PropertyString", "EquipmentId", "ProcessEng", "Stable equipment ID")
-box.EquipmentId = "{struct_id}"
-doc.recompute()
-print("equip_ok")
-'''
-                freecad.execute_code(equip_code)
+                scripts.append((_LAYOUT_ENVELOPE_SRC, {
+                    "doc_name": doc_name,
+                    "spec": spec,
+                    "base_mm": base_mm,
+                    "rotation_deg": envelope_rotation,
+                }))
 
-            # Set view
-            view_code = f'''
-import FreeCAD
-import FreeCADGui
+            # Recompute once for the whole option document, then set view
+            scripts.append((_FIT_VIEW_SRC, {"doc_name": doc_name}))
 
-doc = FreeCAD.getDocument("{doc_name}")
-doc.recompute()
-FreeCADGui.ActiveDocument.ActiveView.viewTop()
-FreeCADGui.ActiveDocument.ActiveView.fitAll()
-print("view_ok")
-'''
-            freecad.execute_code(view_code)
+            results = freecad.execute_batch(scripts)
+            if "doc_created" not in results[0].get("message", ""):
+                return {
+                    "doc_name": doc_name,
+                    "error": "Failed to create document"
+                }
 
-            created_docs.append({
+            return {
                 "doc_name": doc_name,
                 "solution_id": sol_id,
                 "rank": rank,
                 "metrics": metrics,
                 "equipment_count": len(structures)
-            })
+            }
+
+        def build_all() -> list[dict]:
+            # The addon serves one request at a time, so option documents are
+            # built in order (which also keeps each option's newDocument and
+            # its scripts together). A failing option is reported in the
+            # summary instead of aborting the others.
+            created = []
+            for i, sol in enumerate(solutions):
+                try:
+                    created.append(build_option_doc(i, sol))
+                except Exception as e:
+                    rank = sol.get("rank", i + 1)
+                    doc_name = f"{doc_prefix}_Option{i+1}_Rank{rank}"
+                    logger.error("layout_option_failed", doc_name=doc_name, error=str(e))
+                    created.append({"doc_name": doc_name, "error": str(e)})
+            return created
+
+        # One worker thread for the whole build keeps the event loop free
+        created_docs = await asyncio.to_thread(build_all)
 
         # Build summary
         summary = ["Created layout option documents:"]
@@ -2629,7 +2902,7 @@ print("view_ok")
 
         summary.append("\nReview each document in FreeCAD and select preferred layout.")
 
-        screenshot = freecad.get_active_screenshot()
+        screenshot = freecad.get_active_screenshot() if include_screenshot else None
         response = [TextContent(type="text", text="\n".join(summary))]
         return add_screenshot_if_available(response, screenshot, include_screenshot)
 
@@ -2674,187 +2947,67 @@ print("view_ok")
             Status message with finalization results
         """
         freecad = get_freecad_connection()
-        if not freecad.check_connection():
-            return [TextContent(type="text", text="FreeCAD connection not available")]
-
-        results = {
-            "doc_name": doc_name,
-            "solution_id": solution_id,
-            "techdraw_generated": False,
-            "pdf_exported": False,
-            "docs_closed": 0,
-            "layers_hidden": 0,
-            "layers_deleted": 0
-        }
-
-        # Verify document exists and activate it
-        activate_code = f'''
-import FreeCAD
-
-doc = FreeCAD.getDocument("{doc_name}")
-if doc:
-    FreeCAD.setActiveDocument("{doc_name}")
-    print("doc_activated")
-else:
-    print("doc_not_found")
-'''
-        res = freecad.execute_code(activate_code)
-        if "doc_not_found" in res.get("message", ""):
-            return [TextContent(type="text", text=f"Document '{doc_name}' not found")]
-
-        # Handle layer-based workflow
-        if layer_name:
-            layer_code = f'''
-import FreeCAD
-import FreeCADGui
-
-doc = FreeCAD.getDocument("{doc_name}")
-layers_hidden = 0
-layers_deleted = 0
-
-# Find all Layout_* groups
-layout_groups = [obj for obj in doc.Objects
-                 if obj.TypeId == "App::DocumentObjectGroup"
-                 and obj.Label.startswith("Layout_")]
-
-for group in layout_groups:
-    if group.Label == "{layer_name}":
-        # Keep selected layer visible
-        if hasattr(group, "ViewObject") and group.ViewObject:
-            group.ViewObject.Visibility = True
-    else:
-        # Hide or delete other layers
-        if {str(delete_other_layers).lower()}:
-            # Delete the layer and its contents
-            for child in group.Group:
-                doc.removeObject(child.Name)
-            doc.removeObject(group.Name)
-            layers_deleted += 1
-        else:
-            # Just hide
-            if hasattr(group, "ViewObject") and group.ViewObject:
-                group.ViewObject.Visibility = False
-            layers_hidden += 1
-
-doc.recompute()
-print(f"layers_hidden={{layers_hidden}}")
-print(f"layers_deleted={{layers_deleted}}")
-'''
-            layer_res = freecad.execute_code(layer_code)
-            msg = layer_res.get("message", "")
-            if "layers_hidden=" in msg:
-                try:
-                    results["layers_hidden"] = int(msg.split("layers_hidden=")[1].split()[0])
-                except (IndexError, ValueError):
-                    pass
-            if "layers_deleted=" in msg:
-                try:
-                    results["layers_deleted"] = int(msg.split("layers_deleted=")[1].split()[0])
-                except (IndexError, ValueError):
-                    pass
 
-        # Cleanup other option documents if requested (legacy multi-document workflow)
+        close_docs = []
         if cleanup_other_options and other_option_docs:
-            for other_doc in other_option_docs:
-                if other_doc != doc_name:
-                    close_code = f'''
-import FreeCAD
-try:
-    FreeCAD.closeDocument("{other_doc}")
-    print("closed_{other_doc}")
-except:
-    pass
-'''
-                    close_res = freecad.execute_code(close_code)
-                    if f"closed_{other_doc}" in close_res.get("message", ""):
-                        results["docs_closed"] += 1
-
-        # Generate TechDraw if requested (delegate to existing tool)
-        if generate_techdraw:
-            techdraw_code = f'''
-import FreeCAD
-import TechDraw
-
-doc = FreeCAD.getDocument("{doc_name}")
-
-# Create TechDraw page
-page = doc.addObject("TechDraw::DrawPage", "PlanSheet")
-
-# Try to find template
-template_paths = [
-    "/usr/share/freecad/Mod/TechDraw/Templates/A1_Landscape_ISO7200_Pep.svg",
-    "/usr/share/freecad-daily/Mod/TechDraw/Templates/A1_Landscape_ISO7200_Pep.svg",
-]
-template_path = None
-import os
-for path in template_paths:
-    if os.path.exists(path):
-        template_path = path
-        break
-
-if template_path:
-    template_obj = doc.addObject("TechDraw::DrawSVGTemplate", "Template")
-    template_obj.Template = template_path
-    page.Template = template_obj
-
-# Collect source objects
-source_objects = [obj for obj in doc.Objects
-                  if not obj.TypeId.startswith("TechDraw::")
-                  and hasattr(obj, "Shape") and obj.Shape]
-
-if source_objects:
-    # Create top view
-    view = doc.addObject("TechDraw::DrawViewPart", "TopView")
-    view.Source = source_objects
-    view.Direction = FreeCAD.Vector(0, 0, -1)
-    view.XDirection = FreeCAD.Vector(1, 0, 0)
-    view.ScaleType = "Custom"
-    view.Scale = 0.005  # 1:200
-    page.addView(view)
-
-    # Center view on page
-    view.X = 400
-    view.Y = 300
+            close_docs = [d for d in other_option_docs if d != doc_name]
 
-doc.recompute()
-print("techdraw_ok")
-'''
-            td_res = freecad.execute_code(techdraw_code)
-            results["techdraw_generated"] = "techdraw_ok" in td_res.get("message", "")
-
-            # Export PDF if path provided
-            if export_pdf_path and results["techdraw_generated"]:
-                pdf_code = f'''
-import FreeCAD
-import TechDrawGui
-
-doc = FreeCAD.getDocument("{doc_name}")
-page = doc.getObject("PlanSheet")
-if page:
-    TechDrawGui.exportPageAsPdf(page, "{export_pdf_path}")
-    print("pdf_exported")
-'''
-                pdf_res = freecad.execute_code(pdf_code)
-                results["pdf_exported"] = "pdf_exported" in pdf_res.get("message", "")
+        # Activation, layer cleanup, document closing, TechDraw and PDF export
+        # all run in one script. The PDF render can take a while, so the RPC
+        # runs off the event loop. No separate ping first: a refused connection,
+        # protocol error or fault surfaces here.
+        try:
+            res = await asyncio.to_thread(freecad.execute_code, _FINALIZE_SRC, {
+                "doc_name": doc_name,
+                "layer_name": layer_name,
+                "delete_other_layers": delete_other_layers,
+                "close_docs": close_docs,
+                "generate_techdraw": generate_techdraw,
+                "template_path": _resolve_techdraw_template() if generate_techdraw else None,
+                "template_candidates": TECHDRAW_TEMPLATE_CANDIDATES,
+                "export_pdf_path": export_pdf_path,
+            })
+        except (OSError, xmlrpc.client.Error) as e:
+            logger.warning("freecad_unreachable", error=str(e))
+            return [TextContent(type="text", text="FreeCAD connection not available")]
+        msg = res.get("message", "")
+        try:
+            outcome = _script_result(res) if res.get("success") else None
+        except json.JSONDecodeError:
+            outcome = None
+        if outcome is None:
+            error_detail = res.get("error", msg or "Unknown error")
+            logger.error("finalize_layout_failed", doc_name=doc_name, error=error_detail)
+            return [TextContent(type="text", text=f"Failed to finalize layout: {error_detail}")]
+        if not outcome["doc_found"]:
+            return [TextContent(type="text", text=f"Document '{doc_name}' not found")]
+        layers_hidden = outcome["layers_hidden"]
+        layers_deleted = outcome["layers_deleted"]
+        docs_closed = outcome["docs_closed"]
+        techdraw_generated = outcome["techdraw_generated"]
+        pdf_exported = outcome["pdf_exported"]
+
+        # Capture the screenshot while the summary is built. It has to follow
+        # the finalize script: the addon serves one RPC at a time on the GUI
+        # thread, and the view must show the finalized layer visibility.
+        screenshot_task = asyncio.create_task(asyncio.to_thread(freecad.get_active_screenshot)) if include_screenshot else None
+
+        # Build summary; lines for stages that did nothing are None and dropped
+        summary_lines = (
+            f"Finalized layout: {doc_name}",
+            f"  Solution ID: {solution_id}",
+            f"  Selected layer: {layer_name}" if layer_name else None,
+            f"  Other layers hidden: {layers_hidden}" if layers_hidden > 0 else None,
+            f"  Other layers deleted: {layers_deleted}" if layers_deleted > 0 else None,
+            "  TechDraw plan sheet: Generated" if techdraw_generated else None,
+            f"  PDF exported: {export_pdf_path}" if pdf_exported else None,
+            f"  Other options closed: {docs_closed}" if docs_closed > 0 else None,
+            *(f"  Warning: {err}" for err in outcome["errors"]),
+        )
+        summary_text = "\n".join(line for line in summary_lines if line)
 
-        # Build summary
-        summary = [f"Finalized layout: {doc_name}"]
-        summary.append(f"  Solution ID: {solution_id}")
-        if layer_name:
-            summary.append(f"  Selected layer: {layer_name}")
-        if results["layers_hidden"] > 0:
-            summary.append(f"  Other layers hidden: {results['layers_hidden']}")
-        if results["layers_deleted"] > 0:
-            summary.append(f"  Other layers deleted: {results['layers_deleted']}")
-        if results["techdraw_generated"]:
-            summary.append("  TechDraw plan sheet: Generated")
-        if results["pdf_exported"]:
-            summary.append(f"  PDF exported: {export_pdf_path}")
-        if results["docs_closed"] > 0:
-            summary.append(f"  Other options closed: {results['docs_closed']}")
-
-        screenshot = freecad.get_active_screenshot()
-        response = [TextContent(type="text", text="\n".join(summary))]
+        screenshot = await screenshot_task if screenshot_task else None
+        response = [TextContent(type="text", text=summary_text)]
         return add_screenshot_if_available(response, screenshot, include_screenshot)
 
     logger.info("contract_tools_registered")
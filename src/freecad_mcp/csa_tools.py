@@ -27,6 +27,9 @@ from .response_filters import DetailLevel
 logger = structlog.get_logger("FreeCADMCPserver.csa")
 
 
+_JSON_DECODER = json.JSONDecoder()
+
+
 def _extract_json_from_output(output: str) -> dict | None:
     """Extract a JSON object from FreeCAD command output.
 
@@ -46,43 +49,13 @@ def _extract_json_from_output(output: str) -> dict | None:
     if first_brace < 0:
         return None
 
-    candidate = output[first_brace:]
-
-    # Count braces to find the complete JSON object
-    depth = 0
-    in_string = False
-    escape_next = False
-    json_end = -1
-
-    for i, char in enumerate(candidate):
-        if escape_next:
-            escape_next = False
-            continue
-
-        if char == '\\' and in_string:
-            escape_next = True
-            continue
-
-        if char == '"' and not escape_next:
-            in_string = not in_string
-            continue
-
-        if in_string:
-            continue
-
-        if char == '{':
-            depth += 1
-        elif char == '}':
-            depth -= 1
-            if depth == 0:
-                json_end = i + 1
-                break
-
-    if json_end > 0:
-        json_str = candidate[:json_end]
-        return json.loads(json_str)
-
-    return None
+    # raw_decode finds the end of the object in C and ignores trailing output
+    try:
+        obj, _ = _JSON_DECODER.raw_decode(output, first_brace)
+    except ValueError:
+        # Truncated or malformed output: report "no JSON" like callers expect
+        return None
+    return obj
 
 
 def register_csa_tools(mcp, get_freecad_connection, add_screenshot_if_available):
@@ -0,0 +1,158 @@
+"""Coordinate helpers shared by the contract tools.
+
+Contract geometry is expressed in meters while FreeCAD works in mm. These
+helpers do the bulk point conversions with numpy when it is installed and
+fall back to plain Python loops otherwise.
+"""
+
+import math
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Optional: pure-Python loops are used when numpy is not installed
+
+
+def _as_xy_array(points: Sequence[Sequence[float]]):
+    """Return an (N, 2) float64 array of point x/y, or None if not convertible."""
+    if np is None or not points:
+        return None
+    try:
+        arr = np.asarray(points, dtype=np.float64)
+    except (ValueError, TypeError):
+        return None  # Ragged or non-numeric input
+    if arr.ndim != 2 or arr.shape[1] < 2:
+        return None
+    return arr[:, :2]
+
+
+def scale_points(
+    points: Sequence[Sequence[float]],
+    factor: float,
+    z: float | None = None,
+    ndigits: int | None = None,
+) -> list[list[float]]:
+    """Scale the x/y of each point by ``factor`` (e.g. M_TO_MM).
+
+    Extra input coordinates are dropped, matching the 2D wires built from
+    the result. Pass ``z`` to get [x, y, z] points that FreeCAD scripts can
+    unpack straight into ``FreeCAD.Vector(*p)``.
+
+    Args:
+        points: Sequence of [x, y] (or [x, y, z]) points
+        factor: Multiplier applied to both coordinates
+        z: Constant elevation appended to every point (not scaled)
+        ndigits: Round scaled coordinates to this many decimals, so values
+            like 1500.0000000000002 serialize as 1500.0
+
+    Returns:
+        List of [x, y] float pairs, or [x, y, z] triples when z is given
+    """
+    arr = _as_xy_array(points)
+    if arr is not None:
+        arr = arr * factor
+        if ndigits is not None:
+            arr = np.round(arr, ndigits)
+        if z is not None:
+            arr = np.column_stack((arr, np.full(len(arr), z, dtype=np.float64)))
+        return arr.tolist()
+    if ndigits is None:
+        scaled = [(p[0] * factor, p[1] * factor) for p in points]
+    else:
+        scaled = [(round(p[0] * factor, ndigits), round(p[1] * factor, ndigits)) for p in points]
+    if z is not None:
+        return [[x, y, z] for x, y in scaled]
+    return [[x, y] for x, y in scaled]
+
+
+def scale_point_lists(
+    point_lists: Sequence[Sequence[Sequence[float]]],
+    factor: float,
+    z: float | None = None,
+    ndigits: int | None = None,
+) -> list[list[list[float]]]:
+    """Scale several point lists in one pass, preserving the grouping.
+
+    All lists are concatenated into a single array, scaled once and split
+    back, so many short road segments cost one numpy operation.
+
+    Args:
+        point_lists: Sequence of point lists
+        factor: Multiplier applied to both coordinates
+        z: Constant elevation appended to every point (see scale_points)
+        ndigits: Decimals to round scaled coordinates to (see scale_points)
+
+    Returns:
+        List of scaled point lists, in the same order
+    """
+    if np is not None and point_lists:
+        flat = [p for points in point_lists for p in points]
+        arr = _as_xy_array(flat)
+        if arr is not None:
+            arr = arr * factor
+            if ndigits is not None:
+                arr = np.round(arr, ndigits)
+            if z is not None:
+                arr = np.column_stack((arr, np.full(len(arr), z, dtype=np.float64)))
+            bounds = np.cumsum([len(points) for points in point_lists])[:-1]
+            return [chunk.tolist() for chunk in np.split(arr, bounds)]
+    return [scale_points(points, factor, z, ndigits) for points in point_lists]
+
+
+def center_to_corner(
+    center_x: float, center_y: float, width: float, length: float
+) -> tuple[float, float]:
+    """Convert a rectangle center to the corner origin used by Part::Box.
+
+    Site-fit reports equipment centers, while a FreeCAD Part::Box is
+    anchored at its min-x/min-y corner. Width/length must already be
+    swapped for 90/270 rotations (see get_rect_dims_at_rotation).
+
+    Args:
+        center_x: Center X coordinate
+        center_y: Center Y coordinate
+        width: Extent along X, in the same unit as the center
+        length: Extent along Y, in the same unit as the center
+
+    Returns:
+        (corner_x, corner_y)
+    """
+    return center_x - width / 2.0, center_y - length / 2.0
+
+
+def validate_points(points: Sequence[Sequence[float]], name: str = "points", min_points: int = 1) -> None:
+    """Check that ``points`` is a list of finite [x, y] or [x, y, z] numbers.
+
+    Run before building FreeCAD scripts so malformed input fails fast on
+    the client instead of after a round-trip.
+
+    Args:
+        points: Point list to check
+        name: Argument name used in error messages
+        min_points: Minimum number of points required
+
+    Raises:
+        ValueError: If the points are non-numeric, ragged, not 2D/3D,
+            non-finite, or too few
+    """
+    if points is None or len(points) < min_points:
+        raise ValueError(f"{name} needs at least {min_points} points")
+    if np is not None:
+        try:
+            arr = np.asarray(points, dtype=np.float64)
+        except (ValueError, TypeError):
+            raise ValueError(f"{name} must contain only numeric [x, y] points") from None
+        if arr.ndim != 2 or arr.shape[1] not in (2, 3):
+            raise ValueError(f"{name} must be a list of [x, y] or [x, y, z] points")
+        if not np.isfinite(arr).all():
+            raise ValueError(f"{name} contains NaN or infinite coordinates")
+        return
+    for p in points:
+        if not isinstance(p, (list, tuple)) or len(p) not in (2, 3):
+            raise ValueError(f"{name} must be a list of [x, y] or [x, y, z] points")
+        for c in p:
+            if isinstance(c, bool) or not isinstance(c, (int, float)):
+                raise ValueError(f"{name} must contain only numeric [x, y] points")
+            if not math.isfinite(c):
+                raise ValueError(f"{name} contains NaN or infinite coordinates")
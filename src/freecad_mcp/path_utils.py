@@ -9,6 +9,23 @@ import subprocess
 from typing import Optional
 
 
+# Successful WSL->Windows conversions, keyed by (path, use_forward_slashes).
+# Fallback results are not stored, so a transient wslpath failure (e.g. a
+# mount that isn't up yet) is retried on the next call.
+_CONVERTED_PATHS: dict[tuple[str, bool], str] = {}
+_CONVERTED_PATHS_MAX = 256
+
+
+def _remember(key: tuple[str, bool], converted: str) -> str:
+    """Cache a successful conversion and return it."""
+    if len(_CONVERTED_PATHS) >= _CONVERTED_PATHS_MAX:
+        # Rarely hit (one entry per distinct export path); starting over is
+        # simpler than LRU bookkeeping and safe from worker threads
+        _CONVERTED_PATHS.clear()
+    _CONVERTED_PATHS[key] = converted
+    return converted
+
+
 def wsl_to_windows_path(wsl_path: str, use_forward_slashes: bool = True) -> str:
     """Convert WSL path to Windows path for cross-platform compatibility.
 
@@ -16,6 +33,10 @@ def wsl_to_windows_path(wsl_path: str, use_forward_slashes: bool = True) -> str:
     but FreeCAD runs on Windows. Paths like `/tmp/file.pdf` need to be
     converted to Windows-compatible paths like `C:/Users/.../Temp/file.pdf`.
 
+    Successful conversions are cached per (path, slash style), so repeated
+    exports to the same location don't spawn another wslpath/cmd.exe
+    subprocess; unconverted fallbacks are not cached.
+
     Args:
         wsl_path: Path to convert (WSL or Windows format)
         use_forward_slashes: If True, use forward slashes (safe for Python strings).
@@ -50,6 +71,11 @@ def wsl_to_windows_path(wsl_path: str, use_forward_slashes: bool = True) -> str:
     if not is_wsl:
         return wsl_path
 
+    key = (wsl_path, use_forward_slashes)
+    cached = _CONVERTED_PATHS.get(key)
+    if cached is not None:
+        return cached
+
     # Expand ~ before conversion
     expanded_path = os.path.expanduser(wsl_path)
 
@@ -65,7 +91,7 @@ def wsl_to_windows_path(wsl_path: str, use_forward_slashes: bool = True) -> str:
             timeout=5
         )
         if result.returncode == 0:
-            return result.stdout.strip()
+            return _remember(key, result.stdout.strip())
     except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
         pass
 
@@ -84,9 +110,9 @@ def wsl_to_windows_path(wsl_path: str, use_forward_slashes: bool = True) -> str:
                 rest = expanded_path[5:]  # Remove '/tmp/'
                 if use_forward_slashes:
                     win_temp = win_temp.replace('\\', '/')
-                    return f"{win_temp}/{rest}"
+                    return _remember(key, f"{win_temp}/{rest}")
                 else:
-                    return f"{win_temp}\\{rest}"
+                    return _remember(key, f"{win_temp}\\{rest}")
         except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
             pass
 
@@ -1,15 +1,22 @@
+import atexit
+import base64
+import hashlib
 import json
 import logging
 import os
+import pathlib
+import shutil
 import subprocess
 import sys
+import tempfile
+import threading
 import xmlrpc.client
 from contextlib import asynccontextmanager
 from typing import AsyncIterator, Dict, Any, Literal
 
 import structlog
 from mcp.server.fastmcp import FastMCP, Context
-from mcp.types import TextContent, ImageContent
+from mcp.types import TextContent, ImageContent, ResourceLink
 
 # Import contract tools for process engineering
 from .contract_tools import register_contract_tools
@@ -17,6 +24,21 @@ from .techdraw_tools import register_techdraw_tools
 from .csa_tools import register_csa_tools
 from .response_filters import DetailLevel, filter_object_properties, filter_objects_list
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Optional: stdlib json is used when orjson is not installed
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize to a compact JSON string, using orjson when available.
+
+    OPT_NON_STR_KEYS keeps parity with json.dumps for int/float dict keys.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"))
+
 
 def get_windows_host_ip() -> str:
     """Detect Windows host IP when running in WSL.
@@ -129,6 +151,10 @@ logger = structlog.get_logger("FreeCADMCPserver")
 
 
 _only_text_feedback = False
+# "inline" embeds screenshots as base64 PNG; "uri" writes them to a session
+# temp dir and returns file:// references
+_screenshot_mode: Literal["inline", "uri"] = "inline"
+_screenshot_dir: str | None = None
 
 
 class FreeCADConnection:
@@ -148,9 +174,23 @@ class FreeCADConnection:
 
         self.host = host
         self.port = port
-        self.server = xmlrpc.client.ServerProxy(f"http://{host}:{port}", allow_none=True)
+        self._local = threading.local()
         logger.info("freecad_connection_configured", host=host, port=port)
 
+    @property
+    def server(self) -> xmlrpc.client.ServerProxy:
+        """Per-thread XML-RPC proxy.
+
+        ServerProxy reuses one HTTP connection and is not safe to share
+        between threads, so tools that issue RPCs from worker threads each
+        get their own proxy.
+        """
+        proxy = getattr(self._local, "proxy", None)
+        if proxy is None:
+            proxy = xmlrpc.client.ServerProxy(f"http://{self.host}:{self.port}", allow_none=True)
+            self._local.proxy = proxy
+        return proxy
+
     def disconnect(self):
         """Cleanup connection (no-op for XML-RPC but required for interface)"""
         logger.info("freecad_disconnecting", host=self.host, port=self.port)
@@ -160,6 +200,14 @@ class FreeCADConnection:
     def ping(self) -> bool:
         return self.server.ping()
 
+    def check_connection(self) -> bool:
+        """Return True if FreeCAD answers a ping, False on any RPC error."""
+        try:
+            return bool(self.ping())
+        except Exception as e:
+            logger.warning("freecad_ping_failed", host=self.host, port=self.port, error=str(e))
+            return False
+
     def create_document(self, name: str) -> dict[str, Any]:
         return self.server.create_document(name)
 
@@ -175,10 +223,40 @@ class FreeCADConnection:
     def insert_part_from_library(self, relative_path: str) -> dict[str, Any]:
         return self.server.insert_part_from_library(relative_path)
 
-    def execute_code(self, code: str) -> dict[str, Any]:
-        return self.server.execute_code(code)
+    def execute_code(self, code: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+        """Run a script in FreeCAD, exposing ``params`` to it as ``PARAMS``.
+
+        Params travel as one JSON string so that nested values, non-string
+        keys and large ints are not subject to XML-RPC marshalling limits.
+        """
+        if params is None:
+            return self.server.execute_code(code)
+        return self.server.execute_code(code, _dumps(params))
+
+    def execute_batch(self, scripts: list[str | tuple[str, dict[str, Any] | None]]) -> list[dict[str, Any]]:
+        """Run several scripts in order with one RPC round-trip.
+
+        Each entry is either a code string or a (code, params) pair. Results
+        come back in the same order, one execute_code-style dict per script;
+        a failing script does not stop the ones after it.
+
+        Requires the addon from the same release: execute_batch and the
+        params argument of execute_code were added together, so there is no
+        per-script fallback for older addons (it could not send PARAMS, and
+        retrying after a Fault could re-run scripts that already executed).
+        """
+        batch = []
+        for script in scripts:
+            code, params = (script, None) if isinstance(script, str) else script
+            batch.append([code, None if params is None else _dumps(params)])
+        if not batch:
+            return []
+        return self.server.execute_batch(batch)
 
     def get_active_screenshot(self, view_name: str = "Isometric") -> str | None:
+        # Text-only mode drops every screenshot from responses; don't capture one
+        if _only_text_feedback:
+            return None
         try:
             # Check if we're in a view that supports screenshots
             result = self.server.execute_code("""
@@ -284,6 +362,34 @@ def get_freecad_connection():
 
 
 # Helper function to safely add screenshot to response
+def screenshot_content(screenshot: str) -> ImageContent | ResourceLink:
+    """Wrap a screenshot for a tool response according to the screenshot mode.
+
+    In "uri" mode the PNG is written once per distinct image (named by a hash
+    of its data, so identical views across option documents share one file)
+    and returned as a resource link to its file:// URI. The directory is
+    removed when the server exits.
+
+    Args:
+        screenshot: Base64-encoded PNG screenshot data
+
+    Returns:
+        ImageContent with inline data, or a ResourceLink to the PNG file
+    """
+    global _screenshot_dir
+    if _screenshot_mode != "uri":
+        return ImageContent(type="image", data=screenshot, mimeType="image/png")
+
+    if _screenshot_dir is None:
+        _screenshot_dir = tempfile.mkdtemp(prefix="freecad_mcp_screenshots_")
+        atexit.register(shutil.rmtree, _screenshot_dir, ignore_errors=True)
+    digest = hashlib.sha256(screenshot.encode("ascii")).hexdigest()[:16]
+    path = pathlib.Path(_screenshot_dir) / f"{digest}.png"
+    if not path.exists():
+        path.write_bytes(base64.b64decode(screenshot))
+    return ResourceLink(type="resource_link", uri=path.as_uri(), name=f"{digest}.png", mimeType="image/png")
+
+
 def add_screenshot_if_available(response, screenshot, include_screenshot: bool = False):
     """Safely add screenshot to response only if requested and available.
 
@@ -301,7 +407,7 @@ def add_screenshot_if_available(response, screenshot, include_screenshot: bool =
         return response
 
     if screenshot is not None:
-        response.append(ImageContent(type="image", data=screenshot, mimeType="image/png"))
+        response.append(screenshot_content(screenshot))
     # Note: We no longer add "preview unavailable" message in compact mode
     # Only show that message if explicitly requesting screenshots and they fail
     return response
@@ -473,7 +579,7 @@ def create_object(
     try:
         obj_data = {"Name": obj_name, "Type": obj_type, "Properties": obj_properties or {}, "Analysis": analysis_name}
         res = freecad.create_object(doc_name, obj_data)
-        screenshot = freecad.get_active_screenshot()
+        screenshot = freecad.get_active_screenshot() if include_screenshot else None
         
         if res["success"]:
             response = [
@@ -515,7 +621,7 @@ def edit_object(
     freecad = get_freecad_connection()
     try:
         res = freecad.edit_object(doc_name, obj_name, {"Properties": obj_properties})
-        screenshot = freecad.get_active_screenshot()
+        screenshot = freecad.get_active_screenshot() if include_screenshot else None
 
         if res["success"]:
             response = [
@@ -553,7 +659,7 @@ def delete_object(
     freecad = get_freecad_connection()
     try:
         res = freecad.delete_object(doc_name, obj_name)
-        screenshot = freecad.get_active_screenshot()
+        screenshot = freecad.get_active_screenshot() if include_screenshot else None
 
         if res["success"]:
             response = [
@@ -589,7 +695,7 @@ def execute_code(
     freecad = get_freecad_connection()
     try:
         res = freecad.execute_code(code)
-        screenshot = freecad.get_active_screenshot()
+        screenshot = freecad.get_active_screenshot() if include_screenshot else None
 
         if res["success"]:
             response = [
@@ -609,7 +715,7 @@ def execute_code(
 
 
 @mcp.tool()
-def get_view(ctx: Context, view_name: Literal["Isometric", "Front", "Top", "Right", "Back", "Left", "Bottom", "Dimetric", "Trimetric"]) -> list[ImageContent | TextContent]:
+def get_view(ctx: Context, view_name: Literal["Isometric", "Front", "Top", "Right", "Back", "Left", "Bottom", "Dimetric", "Trimetric"]) -> list[ImageContent | ResourceLink | TextContent]:
     """Get a screenshot of the active view.
 
     Args:
@@ -628,11 +734,14 @@ def get_view(ctx: Context, view_name: Literal["Isometric", "Front", "Top", "Righ
     Returns:
         A screenshot of the active view.
     """
+    if _only_text_feedback:
+        return [TextContent(type="text", text="Screenshots are disabled (--only-text-feedback)")]
+
     freecad = get_freecad_connection()
     screenshot = freecad.get_active_screenshot(view_name)
     
     if screenshot is not None:
-        return [ImageContent(type="image", data=screenshot, mimeType="image/png")]
+        return [screenshot_content(screenshot)]
     else:
         return [TextContent(type="text", text="Cannot get screenshot in the current view type (such as TechDraw or Spreadsheet)")]
 
@@ -654,7 +763,7 @@ def insert_part_from_library(
     freecad = get_freecad_connection()
     try:
         res = freecad.insert_part_from_library(relative_path)
-        screenshot = freecad.get_active_screenshot()
+        screenshot = freecad.get_active_screenshot() if include_screenshot else None
 
         if res["success"]:
             response = [
@@ -691,11 +800,11 @@ def get_objects(
     """
     freecad = get_freecad_connection()
     try:
-        screenshot = freecad.get_active_screenshot()
+        screenshot = freecad.get_active_screenshot() if include_screenshot else None
         objects = freecad.get_objects(doc_name)
         filtered_objects = filter_objects_list(objects, detail_level)
         response = [
-            TextContent(type="text", text=json.dumps(filtered_objects)),
+            TextContent(type="text", text=_dumps(filtered_objects)),
         ]
         return add_screenshot_if_available(response, screenshot, include_screenshot)
     except Exception as e:
@@ -725,11 +834,11 @@ def get_object(
     """
     freecad = get_freecad_connection()
     try:
-        screenshot = freecad.get_active_screenshot()
+        screenshot = freecad.get_active_screenshot() if include_screenshot else None
         obj_data = freecad.get_object(doc_name, obj_name)
         filtered_data = filter_object_properties(obj_data, detail_level)
         response = [
-            TextContent(type="text", text=json.dumps(filtered_data)),
+            TextContent(type="text", text=_dumps(filtered_data)),
         ]
         return add_screenshot_if_available(response, screenshot, include_screenshot)
     except Exception as e:
@@ -747,7 +856,7 @@ def get_parts_list(ctx: Context) -> list[str]:
     parts = freecad.get_parts_list()
     if parts:
         return [
-            TextContent(type="text", text=json.dumps(parts))
+            TextContent(type="text", text=_dumps(parts))
         ]
     else:
         return [
@@ -799,13 +908,20 @@ register_csa_tools(mcp, get_freecad_connection, add_screenshot_if_available)
 
 def main():
     """Run the MCP server"""
-    global _only_text_feedback
+    global _only_text_feedback, _screenshot_mode
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--only-text-feedback", action="store_true", help="Only return text feedback")
+    parser.add_argument(
+        "--screenshot-mode",
+        choices=["inline", "uri"],
+        default="inline",
+        help="Return screenshots inline as base64 PNG or as file:// URIs",
+    )
     args = parser.parse_args()
     _only_text_feedback = args.only_text_feedback
-    logger.info("server_config", only_text_feedback=_only_text_feedback)
+    _screenshot_mode = args.screenshot_mode
+    logger.info("server_config", only_text_feedback=_only_text_feedback, screenshot_mode=_screenshot_mode)
     mcp.run()
 
 
@@ -547,7 +547,7 @@ print(result_msg)
 
         try:
             res = freecad.execute_code(code)
-            screenshot = freecad.get_active_screenshot()
+            screenshot = freecad.get_active_screenshot() if include_screenshot else None
 
             if res.get("success"):
                 message = res.get("message", "TechDraw page created")
@@ -902,7 +902,7 @@ print(repr(result))
             import shutil
 
             res = freecad.execute_code(code)
-            screenshot = freecad.get_active_screenshot()
+            screenshot = freecad.get_active_screenshot() if include_screenshot else None
 
             if res.get("success"):
                 output = res.get("message", "")